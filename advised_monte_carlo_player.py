@@ -1,7 +1,11 @@
-from position_eval import position_eval
-from monte_carlo_evaluation import monte_carlo_eval
+from position_eval import position_eval, PositionEvalCache
+from proof_number_search import proof_number_eval
+from monte_carlo_evaluation import monte_carlo_eval, monte_carlo_move_values
 from players import Player, RandomPlayer
-from evaluation import WinnerRewardEvaluator
+from evaluation import WinnerRewardEvaluator, get_winner_reward
+from budget import BudgetExhausted, get_budget
+from parallel import map_moves
+from search_stats import timed, get_phase
 
 
 class AdvisedMonteCarloPlayer(Player):
@@ -9,7 +13,7 @@ class AdvisedMonteCarloPlayer(Player):
     A basic monte carlo player that takes certain wins and ties and avoids certain
     '''
 
-    def __init__(self, pe_depth, mc_simulation_amount, mc_initial_depth, mc_play_depth=-1, mc_evaluator=WinnerRewardEvaluator((1, -1, .5)), pe_rewards=(2, -2, .9, 0, 0), main_player=RandomPlayer(), opponent=RandomPlayer()):
+    def __init__(self, pe_depth, mc_simulation_amount, mc_initial_depth, mc_play_depth=-1, mc_evaluator=WinnerRewardEvaluator((1, -1, .5)), pe_rewards=(2, -2, .9, 0, 0), main_player=RandomPlayer(), opponent=RandomPlayer(), time_limit=None, node_limit=None, pe_share=.5, executor=None, pe_cache_size=100000, pns_node_limit=1000):
         '''
         mc is short for "MonteCarlo"
         pe is short for "Position Evaluator"
@@ -22,7 +26,29 @@ class AdvisedMonteCarloPlayer(Player):
         pe_rewards: the position evaluator rewards for (win, loss, you can tie, opponent can tie, undetermined)
         main_player: the player who is making the moves in the AdvisedMonteCarloPlayer's position when simulating games
         opponent: the player who is playing against the main_player when simulating games
+        time_limit: how many seconds each move can take (None for no limit)
+        node_limit: how many nodes each move can use (None for no limit; see the budget module)
+        pe_share: the part of the time or nodes the position evaluator can use before monte carlo simulation starts
+
+        With a time or node limit, the position evaluator looks one move further ahead at a time (up to pe_depth)
+        ...and then monte carlo simulations are run in rounds until the limit is reached.
+
+        executor: a concurrent.futures.ProcessPoolExecutor to evaluate the moves in
+        ...so that they can be evaluated at the same time (None to evaluate them one at a time)
+        It's only used when there's no time or node limit. See the parallel module for how the work is sent out.
+        pe_cache_size: how many positions the position evaluator remembers between evaluations and moves (0 for none)
+        pns_node_limit: how many positions proof-number search can use to look for forced wins and losses
+        ...past pe_depth after each move that's still a candidate (0 to not use it; see prove_candidates)
         '''
+        if pe_cache_size:
+            self.pe_cache = PositionEvalCache(pe_cache_size)
+        else:
+            self.pe_cache = None
+        self.pns_node_limit = pns_node_limit
+        self.executor = executor
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.pe_share = pe_share
         self.pe_depth = pe_depth
         self.mc_simulation_amount = mc_simulation_amount
         self.mc_initial_depth = mc_initial_depth
@@ -32,33 +58,193 @@ class AdvisedMonteCarloPlayer(Player):
         self.sim_main_player = main_player
         self.sim_opponent = opponent
 
-        # the position evaluation function
-        self.pe_func = lambda game, player_number: position_eval(game, player_number,
-                                                                 self.pe_depth - 1, self.pe_rewards)
+        # positions the position evaluator proved the result of don't need to be simulated
+        # (this needs the evaluator to score games by who won, so that the proven winner can be scored)
+        if self.pe_cache is not None and isinstance(self.mc_evaluator, WinnerRewardEvaluator):
+            self.mc_known_value = self.get_known_value
+        else:
+            self.mc_known_value = None
+
+    # the evaluation functions are methods (not lambdas) so that the player can be pickled and sent to other processes
+
+    def pe_func(self, game, player_number, stats=None):
+        '''The position evaluation function'''
+        return position_eval(game, player_number, self.pe_depth - 1, self.pe_rewards, cache=self.pe_cache, stats=stats)
 
-        # the monte carlo evaluation function
-        self.mc_func = lambda game, player_number: monte_carlo_eval(game, player_number, self.mc_evaluator,
-                                                                    simulation_amount=self.mc_simulation_amount,
-                                                                    initial_depth=self.mc_initial_depth,
-                                                                    play_depth=self.mc_play_depth,
-                                                                    main_player=self.sim_main_player,
-                                                                    opponent=self.sim_opponent)
+    def mc_func(self, game, player_number, stats=None):
+        '''The monte carlo evaluation function'''
+        return monte_carlo_eval(game, player_number, self.mc_evaluator,
+                                simulation_amount=self.mc_simulation_amount,
+                                initial_depth=self.mc_initial_depth,
+                                play_depth=self.mc_play_depth,
+                                main_player=self.sim_main_player,
+                                opponent=self.sim_opponent,
+                                known_value=self.mc_known_value,
+                                stats=stats)
 
     def make_move(self, game):
+        # with collect_stats, the work is counted in a "pe" phase and an "mc" phase
+        stats = self.get_new_stats()
+        with timed(stats):
+            self.make_counted_move(game, stats)
+
+    def make_counted_move(self, game, stats):
+        '''Make a move, counting the work in stats (a SearchStats or None)'''
+        budget = get_budget(self.time_limit, self.node_limit)
+        if budget is not None:
+            self.make_budgeted_move(game, budget, stats)
+            return
+
+        if self.executor is not None:
+            self.make_parallel_move(game, stats)
+            return
+
         main_player = game.active_player
         # Assumes it is making a move on its own turn
         moves = game.get_possible_moves()
-        # get a list of all the possible games for the next move
-        test_games = [game.get_moved_copy(move) for move in moves]
-        # score those games based on the position evaluation
-        pe_scores = [self.pe_func(test_game, main_player).value for test_game in test_games]
-        # upgrade: could check if there are certain win or loss moves and then skip monte carlo if that's the case
-        # score those games based on monte carlo simulations
-        mc_scores = [self.mc_func(test_game, main_player).value for test_game in test_games]
-        # from https://stackoverflow.com/questions/4233476/sort-a-list-by-multiple-attributes
-        # make the best move first based on position evaluation score and then based on  monte carlo score
-        game.make_move(max([(moves[i], (pe_scores[i], mc_scores[i]))
-                            for i in range(len(moves))], key=lambda x: x[1])[0])
+        pe_evaluations = []
+        pe_stats = get_phase(stats, "pe")
+        with timed(pe_stats):
+            for move in moves:
+                # make the move in place (or in a copy for games that can't undo)
+                test_game = game.make_search_move(move)
+                # score the game based on the position evaluation
+                pe_evaluations.append(self.pe_func(test_game, main_player, pe_stats))
+                game.unmake_search_move(test_game)
+
+        # only the moves with the best position evaluation need to be simulated
+        candidates = self.prove_candidates(game, self.get_candidates(moves, pe_evaluations), main_player, stats=stats)
+        if len(candidates) == 1:
+            game.make_move(candidates[0])
+            return
+        mc_scores = []
+        mc_stats = get_phase(stats, "mc")
+        with timed(mc_stats):
+            for move in candidates:
+                test_game = game.make_search_move(move)
+                # score the game based on monte carlo simulations
+                mc_scores.append(self.mc_func(test_game, main_player, mc_stats).value)
+                game.unmake_search_move(test_game)
+        # make the best move based on the monte carlo score (all the candidates have the same position evaluation)
+        game.make_move(max(zip(candidates, mc_scores), key=lambda x: x[1])[0])
+
+    def get_candidates(self, moves, pe_evaluations):
+        '''Return a list of the moves that are tied for the best position evaluation
+        If one of the moves is a certain win, only that move is returned; there's no need to simulate anything.
+        '''
+        for move, evaluation in zip(moves, pe_evaluations):
+            if evaluation.win():
+                return [move]
+        best_value = max([evaluation.value for evaluation in pe_evaluations])
+        return [move for move, evaluation in zip(moves, pe_evaluations) if evaluation.value == best_value]
+
+    def prove_candidates(self, game, candidates, player_number, budget=None, stats=None):
+        '''Return the candidates that are left after looking for forced wins and losses after each of them
+        ...with proof-number search (which can find ones far deeper than the position evaluator can look)
+        If one of them is a proven win, only that move is returned. Otherwise, the proven losses are taken out
+        ...(unless every candidate is one). Each search uses at most pns_node_limit positions and stops if the budget runs out.
+        Only the time the searches take is counted in stats, in a "pns" phase.
+        '''
+        if not self.pns_node_limit or len(candidates) == 1:
+            return candidates
+        not_lost = []
+        with timed(get_phase(stats, "pns")):
+            for move in candidates:
+                test_game = game.make_search_move(move)
+                evaluation = proof_number_eval(test_game, player_number, self.pns_node_limit, self.pe_rewards, budget)
+                game.unmake_search_move(test_game)
+                if evaluation.win():
+                    return [move]
+                if not evaluation.lose():
+                    not_lost.append(move)
+        return not_lost or candidates
+
+    def is_decided(self, pe_evaluations):
+        '''Return whether looking deeper can't change the move: one of the moves is a certain win
+        ...or every move but one is a certain loss
+        (one move being the best so far isn't enough, since looking deeper could prove that another move wins)
+        '''
+        if any([evaluation.win() for evaluation in pe_evaluations]):
+            return True
+        return len([evaluation for evaluation in pe_evaluations if not evaluation.lose()]) <= 1
+
+    def get_known_value(self, game, player_number):
+        '''Return the monte carlo value of a game whose winner the position evaluator already proved (None if it hasn't)'''
+        winner = self.pe_cache.get_proven_winner(game, player_number)
+        if winner is None:
+            return None
+        return get_winner_reward(winner, player_number, self.mc_evaluator.rewards)
+
+    def make_parallel_move(self, game, stats=None):
+        '''Make the same move as make_move, but evaluate the moves in self.executor
+        Only the time each phase takes is counted in stats, since the work is done in other processes.
+        '''
+        main_player = game.active_player
+        moves = game.get_possible_moves()
+        # each position evaluation and each monte carlo evaluation is its own task
+        # the tasks run in other processes, so they can't share self.pe_cache
+        # ...and the monte carlo evaluations have to wait to know which moves are worth simulating
+        with timed(get_phase(stats, "pe")):
+            pe_evaluations = map_moves(self.executor, position_eval, game, moves, main_player,
+                                       self.pe_depth - 1, self.pe_rewards)
+        candidates = self.prove_candidates(game, self.get_candidates(moves, pe_evaluations), main_player, stats=stats)
+        if len(candidates) == 1:
+            game.make_move(candidates[0])
+            return
+        with timed(get_phase(stats, "mc")):
+            mc_evaluations = map_moves(self.executor, monte_carlo_eval, game, candidates, main_player,
+                                       self.mc_evaluator, simulation_amount=self.mc_simulation_amount,
+                                       initial_depth=self.mc_initial_depth, play_depth=self.mc_play_depth,
+                                       main_player=self.sim_main_player, opponent=self.sim_opponent)
+        game.make_move(max(zip(candidates, [evaluation.value for evaluation in mc_evaluations]),
+                           key=lambda x: x[1])[0])
+
+    def make_budgeted_move(self, game, budget, stats=None):
+        '''Make the best move that can be found within the budget'''
+        main_player = game.active_player
+        moves = game.get_possible_moves()
+
+        # look one move ahead at a time, keeping the evaluations from the deepest search that finished
+        # looking a single move ahead is always finished so that there are always evaluations to go on
+        pe_stats = get_phase(stats, "pe")
+        with timed(pe_stats):
+            pe_evaluations = self.get_pe_evaluations(game, moves, main_player, 1, stats=pe_stats)
+            pe_budget = budget.split(self.pe_share)
+            undo_point = game.get_undo_point()
+            try:
+                for depth in range(2, self.pe_depth + 1):
+                    if self.is_decided(pe_evaluations):
+                        # looking deeper can't change the move
+                        break
+                    pe_evaluations = self.get_pe_evaluations(game, moves, main_player, depth, pe_budget, pe_stats)
+            except BudgetExhausted:
+                game.undo_to(undo_point)
+
+        candidates = self.prove_candidates(game, self.get_candidates(moves, pe_evaluations), main_player, budget, stats)
+        if len(candidates) == 1:
+            game.make_move(candidates[0])
+            return
+        # spend the rest of the budget on monte carlo simulations
+        mc_stats = get_phase(stats, "mc")
+        with timed(mc_stats):
+            mc_scores = monte_carlo_move_values(game, candidates, main_player, budget, evaluator=self.mc_evaluator,
+                                                simulation_amount=self.mc_simulation_amount,
+                                                initial_depth=self.mc_initial_depth, play_depth=self.mc_play_depth,
+                                                main_player=self.sim_main_player, opponent=self.sim_opponent,
+                                                known_value=self.mc_known_value, stats=mc_stats)
+        # moves that didn't get simulated go after the ones that did
+        mc_scores = [float("-inf") if score is None else score for score in mc_scores]
+        game.make_move(max(zip(candidates, mc_scores), key=lambda x: x[1])[0])
+
+    def get_pe_evaluations(self, game, moves, player_number, depth, budget=None, stats=None):
+        '''Return a list of the position evaluations of the game after each move, looking depth moves ahead'''
+        pe_evaluations = []
+        for move in moves:
+            test_game = game.make_search_move(move)
+            pe_evaluations.append(position_eval(test_game, player_number, depth - 1, self.pe_rewards, budget,
+                                                self.pe_cache, stats))
+            game.unmake_search_move(test_game)
+        return pe_evaluations
 
 
 if __name__ == "__main__":
@@ -68,5 +254,9 @@ if __name__ == "__main__":
     from players import RandomPlayer, HumanPlayer
     from basic_monte_carlo_player import BasicMonteCarloPlayer
 
-    test_against((AdvisedMonteCarloPlayer(6, 2, 6),
-                  AdvisedMonteCarloPlayer(5, 2, 4)), ConnectFour, comment=6)
+    from concurrent.futures import ProcessPoolExecutor
+
+    # the games are spread across every core, and the match stops once it's clear which player is better
+    with ProcessPoolExecutor() as executor:
+        test_against((AdvisedMonteCarloPlayer(6, 2, 6),
+                      AdvisedMonteCarloPlayer(5, 2, 4)), ConnectFour(), comment=3, executor=executor, error_level=.05)
@@ -1,29 +1,124 @@
 import os
 import random
-import time
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
 
-from flask import Flask, render_template, redirect, request, jsonify
+from flask import Flask, render_template, redirect, request, jsonify, session
 from tic_tac_toe import TicTacToe
 from connect_four import ConnectFour
 from advised_monte_carlo_player import AdvisedMonteCarloPlayer
 from solve_player import SolvePlayer
+from tablebase import solve_positions
+from opening_book import OpeningBook, OpeningBookPlayer, get_player_move
 
 # much of this file is modeled after CS50 psets
 app = Flask(__name__)
-
-# have the bot solve tic-tac-toe on startup
-game = TicTacToe()
-# create a tic-tac-toe bot that will compute and store all the best moves
+# the session cookie only holds an id for the visitor's game (see get_game_session), but it still has to be signed
+# the key has to stay the same between restarts, or every visitor loses their game when the server restarts
+# ...so it's required on Heroku (which sets DYNO), and only made up on the spot when running locally
+app.secret_key = os.getenv("SECRET_KEY")
+if not app.secret_key:
+    if os.getenv("DYNO"):
+        raise RuntimeError("Set the SECRET_KEY config var (for example, heroku config:set SECRET_KEY=...)")
+    print("WARNING: SECRET_KEY isn't set, so every visitor's game will be lost when the server restarts")
+    app.secret_key = os.urandom(24)
+
+# the file with every tic-tac-toe position solved
+TIC_TAC_TOE_TABLEBASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tic_tac_toe.tb")
+
+# create a tic-tac-toe bot that will look up all the best moves
+# it only reads from the tablebase, so every visitor can share it
 tic_tac_toe_bot = SolvePlayer()
-print("Solving tic-tac-toe...")
-tic_tac_toe_bot.make_move(TicTacToe())
-
-# the bot that will play against the human player
-# this is set once a game is chosen
-bot = None
-
-# whether or not the server is currently working on a move
-moving = False
+# have the bot solve tic-tac-toe on startup if it hasn't been solved already
+# the solution is saved to a file so that later starts (and other workers) can just map it into memory
+if not os.path.exists(TIC_TAC_TOE_TABLEBASE):
+    print("Solving tic-tac-toe...")
+    tic_tac_toe_bot.memory = solve_positions(TicTacToe(), tic_tac_toe_bot.my_eval)
+    tic_tac_toe_bot.export_tablebase(TIC_TAC_TOE_TABLEBASE, "tic-tac-toe")
+    tic_tac_toe_bot.memory = {}
+tic_tac_toe_bot.load_tablebase(TIC_TAC_TOE_TABLEBASE, "tic-tac-toe")
+
+# how many seconds the connect4 bot can think about each move
+CONNECT4_TIME_LIMIT = 2.5
+# how many positions each connect4 bot's position evaluator remembers (each visitor has their own bot)
+CONNECT4_PE_CACHE_SIZE = 20000
+
+# the moves for the first few connect4 positions, worked out ahead of time (run opening_book.py to build it)
+# without it, the bot searches every move
+CONNECT4_OPENING_BOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "connect_four_book.json")
+connect4_book = None
+if os.path.exists(CONNECT4_OPENING_BOOK):
+    connect4_book = OpeningBook(CONNECT4_OPENING_BOOK, "connect-four")
+
+# the bot moves run on this many worker threads, so a crowd of visitors can't start an unlimited number of searches
+# (the connect4 bot thinks for a set amount of time, so sharing the processor makes its moves weaker, not slower)
+# (the Procfile gives the server more threads than this, so pages still load while requests wait on bot moves)
+BOT_WORKERS = 4
+bot_executor = ThreadPoolExecutor(max_workers=BOT_WORKERS)
+# how many seconds a /bot_move request waits for the bot before telling the browser to ask again
+BOT_MOVE_DEADLINE = 10
+
+# the games being played, in the form {session id: GameSession, ...}
+# when there are too many, the ones that were played the longest ago are forgotten
+MAX_GAME_SESSIONS = 200
+game_sessions = OrderedDict()
+game_sessions_lock = threading.Lock()
+
+
+class GameSession:
+    '''One visitor's game and the bot they're playing against'''
+
+    def __init__(self, game, bot):
+        '''
+        game: the game being played (the human is player 0 and the bot is player 1)
+        bot: the player that makes the bot's moves
+        moving: whether or not the server is currently working on a move
+        bot_future: the Future for the bot move that's being made in bot_executor (None if there isn't one)
+        lock: held while changing the game session, since a visitor's requests can come in at the same time
+        '''
+        self.game = game
+        self.bot = bot
+        self.moving = False
+        self.bot_future = None
+        self.lock = threading.Lock()
+
+    def make_bot_move(self):
+        '''Have the bot pick a move on a copy of the game and then make it in the real game
+        (the bot searches by making moves in the game it's given, so the real game would look half-played while it thinks)
+        '''
+        with self.lock:
+            game = self.game.get_copy()
+        move = get_player_move(self.bot, game)
+        with self.lock:
+            self.game.make_move(move)
+
+
+def set_game_session(game, bot):
+    '''Start a new game session for the visitor (replacing any game they were already playing) and return it'''
+    if "id" not in session:
+        session["id"] = uuid.uuid4().hex
+    game_session = GameSession(game, bot)
+    with game_sessions_lock:
+        game_sessions.pop(session["id"], None)
+        if len(game_sessions) >= MAX_GAME_SESSIONS:
+            game_sessions.popitem(last=False)
+        game_sessions[session["id"]] = game_session
+    return game_session
+
+
+def get_game_session():
+    '''Return the visitor's game session, or None if they don't have one (or it was forgotten)'''
+    session_id = session.get("id")
+    if session_id is None:
+        return None
+    with game_sessions_lock:
+        game_session = game_sessions.get(session_id)
+        if game_session is not None:
+            # the most recently played games are forgotten last
+            game_sessions.move_to_end(session_id)
+    return game_session
 
 
 @app.after_request
@@ -41,56 +136,58 @@ def homepage():
 
 @app.route("/tictactoe", methods=["GET"])
 def tictactoe():
-    global game, bot, moving
-    # reset moving
-    moving = False
     game = TicTacToe()
     # randomize the first player
     game.active_player = random.choice([0, 1])
     # use the bot that has memorized all the best moves
-    bot = tic_tac_toe_bot
+    set_game_session(game, tic_tac_toe_bot)
     return render_template("tictactoe.html", player=game.active_player)
 
 
 @app.route("/connect4", methods=["GET", "POST"])
 def connect4():
-    global game, bot, moving
-    # reset moving
-    moving = False
     game = ConnectFour()
     # randomize the first player
     game.active_player = random.choice([0, 1])
     # set the bot to be the best generalizeable bot we have (with a solid speed)
-    bot = AdvisedMonteCarloPlayer(7, 2, 4)
+    # it thinks until its time is up, so every move takes about the same time no matter how open the board is
+    bot = AdvisedMonteCarloPlayer(7, 2, 2, time_limit=CONNECT4_TIME_LIMIT, pe_cache_size=CONNECT4_PE_CACHE_SIZE)
+    # the opening moves (where searching takes the longest) come straight from the book
+    if connect4_book is not None:
+        bot = OpeningBookPlayer(connect4_book, bot)
+    set_game_session(game, bot)
     return render_template("connect4.html", player=game.active_player)
 
 
 @app.route("/human_move", methods=["POST"])
 def make_human_move():
-    global moving
+    game_session = get_game_session()
+    if game_session is None:
+        return jsonify({"error": "no game"}), 400
+    game = game_session.game
     # bot_move is 1 if the javascript should request a bot move
     # bot_move is 0 if the javascript should not request a bot move
     bot_move = 0
-    # make sure a move is not currently going on
-    if not moving:
-        moving = True
-        move = request.form.get("move")
-        # deal with race condition of a person clicking multiple times quickly
-        if move:
-            move = int(move)
-            # make sure it really is the player's turn
-            if game.active_player == 0:
-                if move in game.get_continue_moves():
+    with game_session.lock:
+        # make sure a move is not currently going on
+        if not game_session.moving:
+            game_session.moving = True
+            move = request.form.get("move")
+            # deal with race condition of a person clicking multiple times quickly
+            if move:
+                move = int(move)
+                # make sure it really is the player's turn
+                if game.active_player == 0 and move in game.get_continue_moves():
                     game.make_move(move)
                     if game.who_won() is None:
                         bot_move = 1
                         # It's okay if we continue to say we're "moving" when the game is done
                 else:
                     # no move was actually made
-                    moving = False
+                    game_session.moving = False
 
-    # get the json dict from the game
-    json_dict = game.get_json_dict()
+        # get the json dict from the game
+        json_dict = game.get_json_dict()
     # tack on the bot move key/value pair
     json_dict["bot_move"] = bot_move
     return jsonify(json_dict)
@@ -98,12 +195,37 @@ def make_human_move():
 
 @app.route("/bot_move", methods=["POST"])
 def make_bot_move():
-    global moving
-    moving = True
-    bot.make_move(game)
-    time.sleep(1)
-    moving = False
-    return jsonify(game.get_json_dict())
+    game_session = get_game_session()
+    if game_session is None:
+        return jsonify({"error": "no game"}), 400
+    game = game_session.game
+    with game_session.lock:
+        # only start a move if the bot isn't already making one (the browser asks again if a request runs out of time)
+        if game_session.bot_future is None and game.active_player == 1 and game.who_won() is None:
+            game_session.moving = True
+            game_session.bot_future = bot_executor.submit(game_session.make_bot_move)
+        future = game_session.bot_future
+
+    if future is not None:
+        try:
+            future.result(timeout=BOT_MOVE_DEADLINE)
+        except TimeoutError:
+            # the bot is still thinking (or waiting for a worker); the browser will ask again
+            return jsonify({"pending": 1}), 503
+        except Exception:
+            # the game is left how it was (see make_bot_move), so asking again starts a new move
+            app.logger.exception("The bot couldn't make a move")
+            return jsonify({"error": "the bot couldn't make a move"}), 500
+        finally:
+            # once the move is done (or failed), the next request can start another one
+            if future.done():
+                with game_session.lock:
+                    if game_session.bot_future is future:
+                        game_session.bot_future = None
+                        game_session.moving = False
+
+    with game_session.lock:
+        return jsonify(game.get_json_dict())
 
 
 @app.route("/about", methods=["GET", "POST"])
@@ -118,6 +240,6 @@ def instructionspage():
 
 if __name__ == "__main__":
     # app.run(host=os.getenv('IP', '0.0.0.0'), port=int(os.getenv('PORT', 8080)))  # used to run on Cloud9
-    # running on Heroku does not work yet because it looks like the global bot doesn't stay the same when hosted
+    # the games are kept in this process's memory, so the app has to run as a single process (with threads)
     #app.run(threaded=True)  # used to run on heroku
     app.run(debug=False, port=5001) # used to run locally
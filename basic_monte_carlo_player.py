@@ -8,84 +8,79 @@ You can try playing against a BasicMonteCarloPlayer(5, 2) and see how it works!
 '''
 
 from players import Player, RandomPlayer
-from monte_carlo_evaluation import monte_carlo_eval
+from monte_carlo_evaluation import monte_carlo_eval, monte_carlo_move_values, successive_halving_move
 from evaluation import WinnerRewardEvaluator
-# TODO delete
-from onitama import board_to_string
+from budget import get_budget
+from parallel import map_moves
+from search_stats import timed
 
 class BasicMonteCarloPlayer(Player):
-    def __init__(self, simulation_amount=4, initial_depth=0, play_depth=-1, evaluator=WinnerRewardEvaluator((1, -1, .5))):
+    def __init__(self, simulation_amount=4, initial_depth=0, play_depth=-1, evaluator=WinnerRewardEvaluator((1, -1, .5)),
+                 time_limit=None, node_limit=None, executor=None, total_simulations=None):
+        # with a time limit (in seconds) or a node limit, simulation_amount simulations are run for every move
+        # ...over and over until the limit is reached
+        # without one, the moves can be simulated at the same time in a ProcessPoolExecutor (see the parallel module)
+        # with total_simulations, simulation_amount is ignored and total_simulations simulations are split between
+        # ...the moves by successive halving, so bad moves are dropped early (see successive_halving_move)
+        # ...a time limit or node limit can still cut that short
         self.simulation_amount = simulation_amount
         self.initial_depth = initial_depth
         self.play_depth = play_depth
         self.evaluator = evaluator
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.executor = executor
+        self.total_simulations = total_simulations
 
     def make_move(self, game):
+        stats = self.get_new_stats()
+        with timed(stats):
+            self.make_counted_move(game, stats)
+
+    def make_counted_move(self, game, stats):
+        # the work is counted in stats (a SearchStats or None); with an executor, only the time is counted
         assert game.who_won() is None, "Can't make a move in a game that is already over"
         # Assumes it is making a move on its own turn
         poss_moves = game.get_possible_moves()
-        for move in poss_moves:
-            game._assert_move(move)
-        # upgrade: use "game.get_moved_copy()"
-        test_games = []
-        # TODO delete
-        # print("---------REAL BOARD BEFORE----------")
-        # print(board_to_string(game.state.board))
-        # print("-----REAL GAME BEFORE-----")
-        # print(game)
-        game_string = str(game)
-        for move in poss_moves:
-            # TODO delete
-            game._assert_move(move)
-            test_game = game.get_copy()
-            # TODO delete
-            test_game._assert_move(move)
-            # TODO delete
-            # print("---------TEST BOARD BEFORE----------")
-            # print(board_to_string(test_game.state.board))
-            # print("-----TEST GAME BEFORE-----")
-            # print(test_game)
-            # print("-------TEST MOVE BEFORE-------")
-            # print(move)
-            new_game_string = str(game)
-            assert game_string == new_game_string, f"The game changed (without any moves being made)\n*FROM*:\n{game_string}\n\n*TO*:\n{new_game_string}"
-            # TODO delete assertions and prints around here
-            # print(f"The ID of the board I expect the move to be made in is:\n{id(test_game.state.board)}\n^^^that")
-            test_game.make_move(move)
-            new_game_string = str(game)
-            assert game_string == new_game_string, f"The game changed (without any moves being made)\n*FROM*:\n{game_string}\n\n*TO*:\n{new_game_string}"
-            # TODO delete
-            # print("------DEBUGGING AFTER--------")
-            # print("---------TEST BOARD AFTER----------")
-            # print(board_to_string(test_game.state.board))
-            # print("-----TEST GAME AFTER-----")
-            # print(test_game)
-            # print("-------TEST MOVE AFTER-------")
-            # print(move)
-            # TODO delete
-            # print("---------REAL BOARD AFTER----------")
-            # print(board_to_string(game.state.board))
-            # print("-----REAL GAME AFTER-----")
-            # print(game)
-            test_games.append(test_game)
 
-        # TODO delete
-        # print("poss moves:")
-        # print(poss_moves)
+        budget = get_budget(self.time_limit, self.node_limit)
+        if self.total_simulations is not None:
+            game.make_move(successive_halving_move(game, poss_moves, game.active_player, self.total_simulations,
+                                                   budget, evaluator=self.evaluator,
+                                                   initial_depth=self.initial_depth, play_depth=self.play_depth,
+                                                   stats=stats))
+            return
 
-        # from https://stackoverflow.com/questions/6618515/sorting-list-based-on-values-from-another-list
-        # Sort the moves based on a Monte Carlo evaluation
-        scores = [monte_carlo_eval(test_game, player_number=game.active_player, evaluator=self.evaluator,
-                                   simulation_amount=self.simulation_amount, initial_depth=self.initial_depth,
-                                   play_depth=self.play_depth).value
-                  for test_game in test_games]
+        if budget is not None:
+            scores = monte_carlo_move_values(game, poss_moves, game.active_player, budget, evaluator=self.evaluator,
+                                             simulation_amount=self.simulation_amount,
+                                             initial_depth=self.initial_depth, play_depth=self.play_depth,
+                                             stats=stats)
+            # moves that didn't get simulated go after the ones that did
+            scores = [float("-inf") if score is None else score for score in scores]
+            best_score, best_move = max(zip(scores, poss_moves), key=lambda score_move_tuple: score_move_tuple[0])
+            game.make_move(best_move)
+            return
 
-        # TODO delete
-        # print("zipped")
-        # print(list(zip(scores, poss_moves)))
+        # Score the moves based on a Monte Carlo evaluation
+        if self.executor is not None:
+            scores = [evaluation.value for evaluation in
+                      map_moves(self.executor, monte_carlo_eval, game, poss_moves, player_number=game.active_player,
+                                evaluator=self.evaluator, simulation_amount=self.simulation_amount,
+                                initial_depth=self.initial_depth, play_depth=self.play_depth)]
+        else:
+            # each move is made in place (or in a copy for games that can't undo) and undone after it is scored
+            # (the active player has to be looked up before the move is made in place)
+            player_number = game.active_player
+            scores = []
+            for move in poss_moves:
+                test_game = game.make_search_move(move)
+                scores.append(monte_carlo_eval(test_game, player_number=player_number, evaluator=self.evaluator,
+                                               simulation_amount=self.simulation_amount,
+                                               initial_depth=self.initial_depth, play_depth=self.play_depth,
+                                               stats=stats).value)
+                game.unmake_search_move(test_game)
+
+        # from https://stackoverflow.com/questions/6618515/sorting-list-based-on-values-from-another-list
         best_score, best_move = max(zip(scores, poss_moves), key=lambda score_move_tuple: score_move_tuple[0])
-        # print("best move")
-        # print(best_move)
-        # print(f"with score of: {best_score}")
-        assert game.who_won() is None, "Game finished without any moves being made"
         game.make_move(best_move)
@@ -0,0 +1,90 @@
+'''
+Random playouts of many connect x games at once using NumPy arrays.
+
+Playing random games one move at a time in Python is what most of the time in monte_carlo_eval goes into.
+Here, every game takes a step together: each ply picks a random open column for every unfinished board,
+...drops the pieces, and checks all the boards for a win at the same time.
+The boards are the same bitboards SizeableConnectX uses (see sizeable_connect_x.get_geometry),
+...stored as unsigned 64-bit integers, so only boards with at most 64 bits fit.
+
+NumPy is one of the requirements (see requirements.txt). For boards that don't fit, get_connect_x_playout_counts
+...returns None and the games are played out one at a time like before.
+'''
+import random
+
+import numpy as np
+
+# the most bits a board can use
+MAX_BITS = 64
+
+
+def get_connect_x_playout_counts(games, simulation_amount):
+    '''Returns a list with a list in the form [player 0 wins, player 1 wins, ties] for each game in games
+    where the counts are from playing simulation_amount random games from each game to the end
+    Returns None if the board is too big.
+
+    games: a list of unfinished SizeableConnectX games that are all the same size
+    The random numbers come from a NumPy generator seeded by the random module, so seeding random makes this repeatable.
+    '''
+    if not games:
+        return None
+    first_game = games[0]
+    row_amt, col_amt, connect_amt = first_game.row_amt, first_game.column_amt, first_game.connect_amt
+    height = row_amt + 1
+    if height * col_amt > MAX_BITS:
+        return None
+
+    # each board gets an index; the boards for game i are the simulation_amount indexes starting at i * simulation_amount
+    board_amt = len(games) * simulation_amount
+    masks = np.zeros((2, board_amt), dtype=np.uint64)
+    heights = np.zeros((board_amt, col_amt), dtype=np.int64)
+    players = np.zeros(board_amt, dtype=np.int64)
+    for i, game in enumerate(games):
+        boards = slice(i * simulation_amount, (i + 1) * simulation_amount)
+        masks[0, boards] = game.state[0]
+        masks[1, boards] = game.state[1]
+        heights[boards] = game.state[2]
+        players[boards] = game.active_player
+
+    full_mask = np.uint64(first_game.full_mask)
+    shifts = [np.uint64(shift * distance) for shift in first_game.shifts for distance in range(1, connect_amt)]
+    one = np.uint64(1)
+    generator = np.random.default_rng(random.getrandbits(64))
+
+    # the winner of each board (-2 while the board is unfinished)
+    winners = np.full(board_amt, -2, dtype=np.int64)
+    # the indexes of the boards that are still being played
+    active = np.arange(board_amt)
+    while active.size:
+        active_heights = heights[active]
+        # pick a random open column on each board: the full columns get a score that can never be the highest
+        scores = generator.random(active_heights.shape)
+        scores[active_heights >= row_amt] = -1
+        columns = scores.argmax(axis=1)
+        rows = active_heights[np.arange(active.size), columns]
+        bits = one << (columns * height + rows).astype(np.uint64)
+
+        movers = players[active]
+        mover_masks = masks[movers, active] | bits
+        masks[movers, active] = mover_masks
+        heights[active, columns] += 1
+
+        # only the player who just moved could have won
+        won = np.zeros(active.size, dtype=bool)
+        for direction in range(len(first_game.shifts)):
+            line = mover_masks.copy()
+            for shift in shifts[direction * (connect_amt - 1):(direction + 1) * (connect_amt - 1)]:
+                line &= mover_masks >> shift
+            won |= line != 0
+        full = (masks[0, active] | masks[1, active]) == full_mask
+
+        winners[active[won]] = movers[won]
+        winners[active[full & ~won]] = -1
+        players[active] = 1 - movers
+        active = active[~(won | full)]
+
+    ans = []
+    for i in range(len(games)):
+        game_winners = winners[i * simulation_amount:(i + 1) * simulation_amount]
+        ans.append([int((game_winners == 0).sum()), int((game_winners == 1).sum()), int((game_winners == -1).sum())])
+    return ans
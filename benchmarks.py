@@ -0,0 +1,228 @@
+'''
+Speed benchmarks for the games and players (as opposed to performance_testers, which measures how well players play).
+
+For each game it measures:
+* perft: how many positions a second can be reached by making and unmaking every move to a fixed depth
+* random playouts: how many games a second can be played from the start with random moves
+* micro-benchmarks: how long get_copy, make_move (with unmake_move), who_won, and get_hash take in a mid-game position
+* player latency: how long each kind of player takes to make a move in some mid-game positions
+
+Run it from the command line:
+    python benchmarks.py --output results.json
+saves the results, and
+    python benchmarks.py --baseline results.json
+compares a new run against saved results and exits with status 1 if anything got more than --tolerance slower.
+'''
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import timeit
+
+from tic_tac_toe import TicTacToe
+from connect_four import ConnectFour
+from sizeable_connect_x import SizeableConnectX
+from otrio import Otrio
+from onitama import Onitama
+from players import RandomPlayer
+from basic_monte_carlo_player import BasicMonteCarloPlayer
+from advised_monte_carlo_player import AdvisedMonteCarloPlayer
+from mcts_player import MCTSPlayer
+from solve_player import SolvePlayer
+
+# game name: (function that makes the game, perft depth)
+GAMES = {
+    "tic_tac_toe": (TicTacToe, 9),
+    "connect_four": (ConnectFour, 6),
+    "connect_x_4x4x4": (lambda: SizeableConnectX(4, 4, 4), 8),
+    "connect_x_8x8x5": (lambda: SizeableConnectX(8, 8, 5), 5),
+    "otrio": (Otrio, 3),
+    "onitama": (Onitama, 4),
+}
+
+# player name: (function that makes the player, names of the games it's benchmarked on or None for all of them)
+PLAYERS = {
+    "random": (RandomPlayer, None),
+    "basic_monte_carlo": (lambda: BasicMonteCarloPlayer(5), None),
+    "advised_monte_carlo": (lambda: AdvisedMonteCarloPlayer(3, 2, 1), None),
+    "mcts": (lambda: MCTSPlayer(200), None),
+    # solving anything bigger than tic-tac-toe takes far too long for a benchmark
+    "solve": (SolvePlayer, ["tic_tac_toe"]),
+}
+
+# how many random moves into the game the mid-game positions are
+MID_GAME_MOVES = 4
+# how many seconds each micro-benchmark runs for (about)
+MICRO_SECONDS = .2
+
+
+def perft(game, depth):
+    '''Returns how many positions are exactly depth moves from the game (finished games count as ones that are)'''
+    if depth == 0 or game.who_won() is not None:
+        return 1
+    ans = 0
+    for move in game.get_possible_moves():
+        test_game = game.make_search_move(move)
+        ans += perft(test_game, depth - 1)
+        game.unmake_search_move(test_game)
+    return ans
+
+
+def get_mid_game(make_game, seed):
+    '''Returns a game MID_GAME_MOVES random moves in (or fewer, if the game would be over), the same for the same seed'''
+    rng = random.Random(seed)
+    game = make_game()
+    for i in range(MID_GAME_MOVES):
+        moves = game.get_possible_moves()
+        test_game = game.get_moved_copy(rng.choice(moves))
+        if test_game.who_won() is not None:
+            break
+        game = test_game
+    return game
+
+
+def time_per_call(function):
+    '''Returns about how many seconds a call to function takes, running it for about MICRO_SECONDS'''
+    timer = timeit.Timer(function)
+    number, total = timer.autorange()
+    number = max(1, int(number * MICRO_SECONDS / max(total, 1e-9)))
+    return min(timer.repeat(repeat=5, number=number)) / number
+
+
+def benchmark_game(name, make_game, perft_depth, playout_seconds=1, positions=3):
+    '''Returns a dictionary of results for the game in the form {benchmark name: (value, unit, whether higher is better)}'''
+    results = {}
+
+    game = make_game()
+    start_time = time.perf_counter()
+    nodes = perft(game, perft_depth)
+    seconds = time.perf_counter() - start_time
+    results["perft_{}.nodes".format(perft_depth)] = (nodes, "positions", None)
+    results["perft_{}.nodes_per_second".format(perft_depth)] = (nodes / seconds, "positions/s", True)
+
+    player = RandomPlayer()
+    playouts = 0
+    start_time = time.perf_counter()
+    while time.perf_counter() - start_time < playout_seconds:
+        game = make_game()
+        while game.who_won() is None:
+            player.make_move(game)
+        playouts += 1
+    results["playouts_per_second"] = (playouts / (time.perf_counter() - start_time), "games/s", True)
+
+    game = get_mid_game(make_game, 0)
+    move = game.get_possible_moves()[0]
+
+    def make_and_unmake():
+        game.make_move(move)
+        game.unmake_move()
+
+    def uncached_who_won():
+        # time working out who won, not looking up the answer from the last call
+        type(game).clear_result_cache()
+        return game.who_won()
+
+    results["get_copy.seconds"] = (time_per_call(game.get_copy), "s", False)
+    results["make_unmake_move.seconds"] = (time_per_call(make_and_unmake), "s", False)
+    results["who_won.seconds"] = (time_per_call(uncached_who_won), "s", False)
+    results["get_hash.seconds"] = (time_per_call(game.get_hash), "s", False)
+
+    for player_name, (make_player, game_names) in PLAYERS.items():
+        if game_names is not None and name not in game_names:
+            continue
+        total = 0
+        for seed in range(positions):
+            # seeding makes the players' simulations the same every run
+            random.seed(seed)
+            game = get_mid_game(make_game, seed)
+            # a new player for every position, so nothing it remembers from the last one makes this one faster
+            player = make_player()
+            start_time = time.perf_counter()
+            player.make_move(game)
+            total += time.perf_counter() - start_time
+        results["player.{}.seconds_per_move".format(player_name)] = (total / positions, "s", False)
+
+    return {"{}.{}".format(name, key): {"value": value, "unit": unit, "higher_is_better": higher_is_better}
+            for key, (value, unit, higher_is_better) in results.items()}
+
+
+def run_benchmarks(game_names=None, comment=1):
+    '''Returns the results of benchmarking the games (all of them if game_names is None) in a JSON-friendly dictionary'''
+    results = {}
+    for name, (make_game, perft_depth) in GAMES.items():
+        if game_names is not None and name not in game_names:
+            continue
+        if comment > 0:
+            print("Benchmarking {}...".format(name))
+        results.update(benchmark_game(name, make_game, perft_depth))
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "results": results,
+    }
+
+
+def compare(results, baseline, tolerance=.2):
+    '''Returns a list of (benchmark name, baseline value, new value, change) for the benchmarks in both results
+    ...where change is how much faster the new results are (-.2 means 20% slower), and a list of the names of the
+    ...benchmarks that got more than tolerance slower
+    Benchmarks that only count things (like perft nodes) are only compared to check that the counts didn't change.
+    '''
+    rows = []
+    regressions = []
+    for name, new in results["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            continue
+        old_value, new_value = old["value"], new["value"]
+        higher_is_better = new["higher_is_better"]
+        if higher_is_better is None:
+            # a count; it should be exactly the same
+            change = 0 if old_value == new_value else None
+        elif higher_is_better:
+            change = new_value / old_value - 1
+        else:
+            change = old_value / new_value - 1
+        rows.append((name, old_value, new_value, change))
+        if change is None or change < -tolerance:
+            regressions.append(name)
+    return rows, regressions
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Benchmark how fast the games and players are")
+    parser.add_argument("--output", help="file to save the results to (as JSON)")
+    parser.add_argument("--baseline", help="file with saved results to compare against")
+    parser.add_argument("--tolerance", type=float, default=.2,
+                        help="how much slower (as a fraction) something can get before it counts as a regression")
+    parser.add_argument("--games", nargs="+", choices=list(GAMES), help="which games to benchmark (default: all)")
+    args = parser.parse_args(args)
+
+    results = run_benchmarks(args.games)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.baseline is None:
+        for name, result in sorted(results["results"].items()):
+            print("{:60} {:>14.6g} {}".format(name, result["value"], result["unit"]))
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    rows, regressions = compare(results, baseline, args.tolerance)
+    for name, old_value, new_value, change in sorted(rows):
+        change_string = "changed!" if change is None else "{:+.1%}".format(change)
+        flag = " <-- regression" if name in regressions else ""
+        print("{:60} {:>14.6g} {:>14.6g} {:>10}{}".format(name, old_value, new_value, change_string, flag))
+    if regressions:
+        print("{} regression(s) beyond {:.0%}".format(len(regressions), args.tolerance))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+'''
+Budgets let players search for as long as they're allowed to and then stop with the best move they found so far.
+'''
+import time
+
+
+class BudgetExhausted(Exception):
+    '''Raised by Budget.spend when the budget has run out'''
+
+
+class Budget:
+    '''A limit on how long a search can take (in seconds of wall-clock time) and how many nodes it can visit
+
+    A node is a position evaluated by position_eval or a game simulated by monte_carlo_eval.
+    Searches call spend for each node and stop when it raises BudgetExhausted.
+    '''
+
+    def __init__(self, seconds=None, nodes=None, parent=None):
+        '''seconds and nodes are the limits (None for no limit)
+        parent is a budget that everything spent from this budget is also spent from
+        '''
+        self.deadline = None if seconds is None else time.perf_counter() + seconds
+        self.node_limit = nodes
+        self.nodes = 0
+        self.parent = parent
+
+    def spend(self, nodes=1):
+        '''Count nodes against the budget; raises BudgetExhausted if the budget has run out'''
+        if self.exhausted(nodes):
+            raise BudgetExhausted()
+
+    def exhausted(self, nodes=0):
+        '''Count nodes against the budget and return whether or not the budget has run out'''
+        self.nodes += nodes
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            return True
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            return True
+        return self.parent is not None and self.parent.exhausted(nodes)
+
+    def get_nodes_left(self):
+        '''Return how many more nodes can be spent before the budget (or a parent budget) runs out
+        ...or None if there's no node limit
+        '''
+        ans = None if self.node_limit is None else max(0, self.node_limit - self.nodes)
+        if self.parent is not None:
+            parent_left = self.parent.get_nodes_left()
+            if parent_left is not None and (ans is None or parent_left < ans):
+                ans = parent_left
+        return ans
+
+    def split(self, fraction):
+        '''Return a budget that gets the given fraction of what is left of this budget
+        Everything spent from it is spent from this budget too.
+        '''
+        seconds = None
+        if self.deadline is not None:
+            seconds = max(0, self.deadline - time.perf_counter()) * fraction
+        nodes = None
+        if self.node_limit is not None:
+            nodes = max(0, self.node_limit - self.nodes) * fraction
+        return Budget(seconds, nodes, parent=self)
+
+    def __str__(self):
+        return "<Budget object with {} nodes spent>".format(self.nodes)
+
+
+def get_budget(seconds=None, nodes=None):
+    '''Return a Budget with the given limits, or None if there are no limits'''
+    if seconds is None and nodes is None:
+        return None
+    return Budget(seconds, nodes)
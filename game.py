@@ -3,6 +3,43 @@ By London Lowmanstone
 Class for games
 '''
 import random
+import threading
+from functools import wraps
+
+# what a result table gives back for states it hasn't seen yet (None is a real answer for who_won)
+_MISSING = object()
+
+
+class ResultCacheCounts(threading.local):
+    '''How many calls to each cached method were answered from its table and how many had to be worked out
+    Each thread has its own counts, so a search in one thread doesn't mix its numbers with another's
+    '''
+    def __init__(self, names):
+        self.counts = {name: [0, 0] for name in names}
+
+
+def cache_results(method, table, counts, size):
+    '''Return a version of the method that remembers its results by the game's result cache key
+    The results are handed back as they are, so only cache methods whose results nobody changes
+    '''
+    name = method.__name__
+
+    @wraps(method)
+    def cached_method(self):
+        key = self.get_result_cache_key()
+        result = table.get(key, _MISSING)
+        if result is not _MISSING:
+            counts.counts[name][0] += 1
+            return result
+        counts.counts[name][1] += 1
+        result = method(self)
+        if len(table) >= size:
+            # forgetting everything at once is much cheaper than keeping track of which states were used last
+            table.clear()
+        table[key] = result
+        return result
+
+    return cached_method
 
 
 class Game():
@@ -17,6 +54,62 @@ class Game():
         '''Returns the number of the other player (either a 0 or 1)'''
         return (player + 1) % 2
 
+    # whether or not the game implements unmake_move
+    # searches make and unmake moves in place in games that can undo, and only copy games that can't
+    can_undo = False
+
+    # names of methods (that only take self) whose results are remembered for every state the class has seen
+    # this only pays off when the method is much slower than get_result_cache_key and searches see the same states a lot
+    # ...so it is off unless a game turns it on (measure first - for most of the bundled games the lookups cost more)
+    # each class that sets this gets its own tables, which are shared by all of its games and subclasses
+    cached_methods = ()
+    # how many results each table holds before it is emptied
+    result_cache_size = 100000
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if "cached_methods" not in cls.__dict__:
+            return
+        cls.result_tables = {}
+        cls.result_cache_counts = ResultCacheCounts(cls.cached_methods)
+        for name in cls.cached_methods:
+            method = getattr(cls, name)
+            # don't stack a second table on a method a parent class already caches
+            method = getattr(method, "__wrapped__", method)
+            table = cls.result_tables[name] = {}
+            setattr(cls, name, cache_results(method, table, cls.result_cache_counts, cls.result_cache_size))
+
+    @classmethod
+    def get_cache_stats(cls):
+        '''Return a dictionary from each cached method name to a dictionary of how many calls in this thread
+        ...were answered from the table ("hits") and how many had to be worked out ("misses")
+        '''
+        if not cls.cached_methods:
+            return {}
+        return {name: {"hits": hits, "misses": misses}
+                for name, (hits, misses) in cls.result_cache_counts.counts.items()}
+
+    @classmethod
+    def reset_cache_stats(cls):
+        '''Set this thread's hit and miss counts back to 0'''
+        if cls.cached_methods:
+            for name_counts in cls.result_cache_counts.counts.values():
+                name_counts[0] = name_counts[1] = 0
+
+    @classmethod
+    def clear_result_cache(cls):
+        '''Forget every remembered result (the counts are kept)'''
+        if cls.cached_methods:
+            for table in cls.result_tables.values():
+                table.clear()
+
+    def get_result_cache_key(self):
+        '''Return what cached results are remembered under
+        It has to be different for any two states that could have different results,
+        ...so games whose state hash isn't unique across every game of the class should override this
+        '''
+        return self.get_state_hash(), self.active_player
+
     def __init__(self, state_and_player=None):
         '''Initialize the game with a state'''
         if state_and_player is None:
@@ -24,14 +117,43 @@ class Game():
             self.active_player = 0
         else:
             self.state, self.active_player = state_and_player
+        # what games that can undo need to remember to unmake each move, from the first move to the last
+        # copies start with an empty journal
+        self.undo_journal = []
 
     def get_hash(self):
-        '''Return a unique string for the state as if player 0 was making the next move'''
+        '''Return a unique integer for the state as if player 0 was making the next move'''
         if self.active_player == 1:
-            return self.get_swapped_copy().get_state_hash()
+            return self.get_swapped_state_hash()
         else:
             return self.get_state_hash()
 
+    def get_swapped_state_hash(self):
+        '''Return the state hash the game would have after swap_players.
+        Games that can work this out from their state hash should override this so that no copy has to be made.
+        '''
+        return self.get_swapped_copy().get_state_hash()
+
+    def get_canonical_hash(self):
+        '''Return a tuple in the form (canonical hash, symmetry)
+
+        The canonical hash is like get_hash, except that it is the same for all of the positions
+        ...that are symmetric versions of each other (such as a board and its mirror image).
+        The symmetry is what move_to_canonical and canonical_to_move need to turn moves in this game into moves
+        ...in the canonical position and back.
+        Games with symmetries can override this (and those two methods) so that players that memorize positions
+        ...only need to remember and solve one of each set of symmetric positions.
+        '''
+        return self.get_hash(), None
+
+    def move_to_canonical(self, move, symmetry):
+        '''Return the move in the canonical position that matches the move in this game (see get_canonical_hash)'''
+        return move
+
+    def canonical_to_move(self, move, symmetry):
+        '''Return the move in this game that matches the move in the canonical position (see get_canonical_hash)'''
+        return move
+
     def get_next_level(self):
         '''Return a list of all the games that can be reached within one action from the current game'''
         ans = []
@@ -49,15 +171,20 @@ class Game():
         '''
         if depth == 1:
             # if you have no descendants, return 1 since you're the only final state
-            return len(self.get_next_level()) or 1
+            return len(self.get_continue_moves()) or 1
         elif depth != 0:
-            next_level = self.get_next_level()
-            if len(next_level) == 0:
+            moves = self.get_continue_moves()
+            if len(moves) == 0:
                 # this is the only final state here
                 return 1
             else:
                 # return the number of final states of your descendants
-                return sum([game.get_complexity(depth - 1) for game in next_level])
+                ans = 0
+                for move in moves:
+                    game = self.make_search_move(move)
+                    ans += game.get_complexity(depth - 1)
+                    self.unmake_search_move(game)
+                return ans
         else:
             return 0
 
@@ -70,6 +197,15 @@ class Game():
         else:
             return []
 
+    @classmethod
+    def get_random_playout_counts(cls, games, simulation_amount):
+        '''Returns a list with a list in the form [player 0 wins, player 1 wins, ties] for each game in games
+        where the counts are from playing simulation_amount games with random moves from each (unfinished) game
+        Games that have a faster way to play many random games at once than playing them one by one can implement this;
+        ...returning None means they don't, so monte_carlo_eval plays the games out itself.
+        '''
+        return None
+
     def get_swapped_copy(self):
         '''Get a copy of the game with the players swapped'''
         ans = self.get_copy()
@@ -82,6 +218,31 @@ class Game():
         ans.make_move(move)
         return ans
 
+    def make_search_move(self, move):
+        '''Make a move while searching and return the game the move was made in.
+        Games that can undo make the move in place and return themselves; other games return a moved copy.
+        Every call must be paired with a call to unmake_search_move once the returned game has been searched.
+        '''
+        if self.can_undo:
+            self.make_move(move)
+            return self
+        else:
+            return self.get_moved_copy(move)
+
+    def unmake_search_move(self, searched_game):
+        '''Undo make_search_move; searched_game is the game that make_search_move returned'''
+        if searched_game is self:
+            self.unmake_move()
+
+    def get_undo_point(self):
+        '''Return a marker of the current state that undo_to can return the game to'''
+        return len(self.undo_journal)
+
+    def undo_to(self, undo_point):
+        '''Unmake moves until the game is back at the state get_undo_point returned undo_point for'''
+        while len(self.undo_journal) > undo_point:
+            self.unmake_move()
+
     def get_initial_state(self):
         '''Return the initial state of the game.
         The state can be anything (object, string, number, etc.).
@@ -89,7 +250,11 @@ class Game():
         raise NotImplementedError
 
     def get_state_hash(self):
-        '''Return a unique string for the state'''
+        '''Return a unique integer for the state.
+        It should be cheap to get, so games should keep it up to date as moves are made
+        ...or pack it straight out of their state.
+        Strings work too, but integers make faster and smaller dictionary keys for the players that memorize positions.
+        '''
         raise NotImplementedError
 
     def get_json_dict(self):
@@ -123,6 +288,13 @@ class Game():
         '''
         raise NotImplementedError
 
+    def unmake_move(self):
+        '''Undo the last move made with make_move, restoring both the state and the active player.
+        Only games with can_undo set to True need to implement this.
+        Those games should record what they need in self.undo_journal whenever make_move is called.
+        '''
+        raise NotImplementedError
+
     def who_won(self):
         '''Return 0 if player 0 won, 1 if player 1 won, -1 if there was a tie, and None if the game has not finished'''
         raise NotImplementedError
@@ -16,7 +16,8 @@ class IndexPlayer(Player):
 
     def make_move(self, game):
         self.add_predetermined(self.index_func(game, player_number=game.active_player))
-        game.make_move(self.predetermined[game.get_hash()][0])
+        game_hash, symmetry = game.get_canonical_hash()
+        game.make_move(game.canonical_to_move(self.predetermined[game_hash][0], symmetry))
 
     def add_predetermined(self, more):
         # a template that subclasses can override
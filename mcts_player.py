@@ -0,0 +1,233 @@
+'''
+A Monte Carlo tree search player (using the UCT formula to choose which moves to explore).
+
+Instead of simulating every move the same amount like the BasicMonteCarloPlayer, it grows a tree of moves
+...and spends more of its simulations on the moves that look the most promising.
+The tree is kept between moves, so the part of the tree under the moves that were actually made doesn't get thrown away.
+'''
+import math
+import random
+
+from players import Player, RandomPlayer
+from evaluation import WinnerRewardEvaluator
+from budget import get_budget
+from search_stats import timed
+
+
+class Node:
+    '''A position in the search tree'''
+    __slots__ = ("move", "parent", "player", "children", "untried_moves", "visits", "value")
+
+    def __init__(self):
+        self.children = []
+
+    def set_up(self, move, parent, player, untried_moves):
+        '''
+        move: the move that was made to get to this position from the parent position
+        player: the number of the player who made that move
+        untried_moves: the moves from this position that don't have nodes yet
+        visits: how many simulations went through this position
+        value: the total reward of those simulations for the player who made the move
+        '''
+        self.move = move
+        self.parent = parent
+        self.player = player
+        self.untried_moves = untried_moves
+        self.visits = 0
+        self.value = 0
+
+
+class MCTSPlayer(Player):
+    def __init__(self, iterations=None, time_limit=None, node_limit=None, exploration=1.4, max_nodes=200000,
+                 evaluator=WinnerRewardEvaluator((1, -1, .5)), play_depth=-1,
+                 main_player=RandomPlayer(), opponent=RandomPlayer()):
+        '''
+        iterations: how many simulations to run for each move
+        time_limit: how many seconds each move can take
+        node_limit: how many simulations each move can use (like iterations, but counted by a Budget)
+        ...if none of these are given, 1000 simulations are run for each move
+        exploration: how much to favor trying moves that haven't been simulated much over moves that look good
+        max_nodes: the most nodes the tree can have; once it's full, simulations still run but the tree stops growing
+        evaluator: evaluator that scores the games at the end of each simulation
+        play_depth: how many moves each simulation plays out before evaluating (-1 to play out the entire game)
+        main_player: the player who makes the moves in the MCTSPlayer's position when simulating games
+        opponent: the player who plays against the main_player when simulating games
+        '''
+        if iterations is None and time_limit is None and node_limit is None:
+            iterations = 1000
+        self.iterations = iterations
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.exploration = exploration
+        self.max_nodes = max_nodes
+        self.evaluator = evaluator
+        self.play_depth = play_depth
+        self.sim_main_player = main_player
+        self.sim_opponent = opponent
+
+        # the root of the tree, and a copy of the game at the root (to find the opponent's move in the tree)
+        self.root = None
+        self.root_game = None
+        # how many nodes are in the tree, and nodes that were taken out of the tree and can be used again
+        self.node_count = 0
+        self.free_nodes = []
+
+    def get_node(self, move, parent, player, untried_moves):
+        '''Return a node for the tree, reusing a recycled one if there is one'''
+        if self.free_nodes:
+            node = self.free_nodes.pop()
+        else:
+            node = Node()
+        node.set_up(move, parent, player, untried_moves)
+        self.node_count += 1
+        return node
+
+    def recycle(self, node):
+        '''Take a node and everything under it out of the tree so that the nodes can be reused'''
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            stack.extend(node.children)
+            node.children.clear()
+            node.parent = None
+            node.untried_moves = None
+            self.free_nodes.append(node)
+            self.node_count -= 1
+
+    def get_new_root(self, game):
+        '''Return a node for the game's position, using the tree from earlier moves if the position is in it'''
+        if self.root is not None:
+            position = (game.get_state_hash(), game.active_player)
+            if (self.root_game.get_state_hash(), self.root_game.active_player) == position:
+                return self.root
+            # look for the opponent's move under the old root
+            for child in self.root.children:
+                test_game = self.root_game.make_search_move(child.move)
+                found = (test_game.get_state_hash(), test_game.active_player) == position
+                self.root_game.unmake_search_move(test_game)
+                if found:
+                    self.root.children.remove(child)
+                    self.recycle(self.root)
+                    child.parent = None
+                    return child
+            self.recycle(self.root)
+        moves = list(game.get_continue_moves())
+        random.shuffle(moves)
+        return self.get_node(None, None, game.get_other_player(game.active_player), moves)
+
+    def make_move(self, game):
+        stats = self.get_new_stats()
+        with timed(stats):
+            self.make_counted_move(game, stats)
+
+    def make_counted_move(self, game, stats):
+        '''Make a move, counting the work in stats (a SearchStats or None)
+        Nodes are the nodes added to the tree, and finding the position in the tree from earlier moves is a cache hit.
+        '''
+        root = self.get_new_root(game)
+        if stats is not None and root.visits:
+            stats.cache_hits += 1
+        budget = get_budget(self.time_limit, self.node_limit)
+        iteration = 0
+        while self.iterations is None or iteration < self.iterations:
+            if budget is not None and budget.exhausted(1):
+                break
+            self.simulate(root, game, stats)
+            iteration += 1
+
+        if not root.children:
+            # no simulations finished (or the tree was too full to add any moves), so there's nothing to go on
+            game.make_move(random.choice(root.untried_moves))
+            self.recycle(root)
+            self.root = None
+            self.root_game = None
+            return
+
+        # the move that was simulated the most is the one the search is most sure of
+        best_child = max(root.children, key=lambda child: child.visits)
+        game.make_move(best_child.move)
+
+        # keep the tree under the move that was made for next time
+        root.children.remove(best_child)
+        self.recycle(root)
+        best_child.parent = None
+        self.root = best_child
+        self.root_game = game.get_copy()
+
+    def simulate(self, root, original_game, stats=None):
+        '''Run one simulation from the root and add what it found to the tree'''
+        if original_game.can_undo:
+            # play the simulation in place and undo the moves afterwards
+            game = original_game
+            undo_point = game.get_undo_point()
+        else:
+            game = original_game.get_copy()
+            if stats is not None:
+                stats.copies += 1
+
+        # go down the tree, choosing the moves with the best balance of a good value and few visits
+        node = root
+        log = math.log
+        sqrt = math.sqrt
+        exploration = self.exploration
+        while not node.untried_moves and node.children:
+            log_visits = log(node.visits)
+            node = max(node.children, key=lambda child: child.value / child.visits +
+                       exploration * sqrt(log_visits / child.visits))
+            game.make_move(node.move)
+
+        # add a node for a move that hasn't been tried yet
+        if node.untried_moves and self.node_count < self.max_nodes:
+            move = node.untried_moves.pop()
+            player = game.active_player
+            game.make_move(move)
+            moves = list(game.get_continue_moves())
+            random.shuffle(moves)
+            child = self.get_node(move, node, player, moves)
+            node.children.append(child)
+            node = child
+            if stats is not None:
+                stats.nodes += 1
+
+        # play out the rest of the game
+        players = [None, None]
+        players[root.player] = self.sim_opponent
+        players[game.get_other_player(root.player)] = self.sim_main_player
+        moves_left = self.play_depth
+        if stats is not None and game is original_game:
+            playout_start = len(game.undo_journal)
+        while game.who_won() is None:
+            if moves_left > 0:
+                moves_left -= 1
+            elif moves_left == 0:
+                break
+            players[game.active_player].make_move(game)
+        rewards = (self.evaluator.evaluate(game, 0).value, self.evaluator.evaluate(game, 1).value)
+        if stats is not None:
+            stats.playouts += 1
+            if game is original_game:
+                # the moves are counted from the undo journal so that the loop above doesn't slow down
+                plies = len(game.undo_journal) - playout_start
+                stats.playout_plies += plies
+                stats.who_won_calls += plies + 1
+
+        # give the result to every node on the way back up the tree
+        while node is not None:
+            node.visits += 1
+            node.value += rewards[node.player]
+            node = node.parent
+
+        if game is original_game:
+            game.undo_to(undo_point)
+
+    def __str__(self):
+        return "<MCTSPlayer object>"
+
+
+if __name__ == "__main__":
+    from performance_testers import test_against
+    from connect_four import ConnectFour
+    from basic_monte_carlo_player import BasicMonteCarloPlayer
+
+    test_against((MCTSPlayer(time_limit=1), BasicMonteCarloPlayer(2, 1, time_limit=1)), ConnectFour(),
+                 rounds=1, games_per_round=10, comment=3)
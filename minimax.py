@@ -1,13 +1,16 @@
 # generalizable minimax
 
 
-def complete_minimax(game, depth, eval_func, player_number=None, ans=None):
+def complete_minimax(game, depth, eval_func, player_number=None, ans=None, stats=None):
     '''
     Returns a dictionary in the form:
-    {game hash: (best move for the active player to make in this game,
-                 expected value of the move according to the player with player number player_number), ...}
+    {canonical game hash: (best move for the active player to make in the canonical game,
+                           expected value of the move according to the player with player number player_number), ...}
     where the dictionary will include all of the game hashes up to the given depth where a move could be made
+    The hashes and moves are for the canonical version of each game (see Game.get_canonical_hash),
+    ...so use game.canonical_to_move to turn a move from the dictionary into a move in the game.
     We assume that the active player is making the move in the game (not player 0)
+    stats is a SearchStats that the work is counted in (see the search_stats module)
     '''
     # if not specified, assume that we evaluate from the viewpoint of the active player
     if player_number is None:
@@ -20,9 +23,15 @@ def complete_minimax(game, depth, eval_func, player_number=None, ans=None):
     # the information ans will contain about this game
     best_move = None
     expected_value = None
+    game_hash, symmetry = game.get_canonical_hash()
 
     # only want moves that will continue the game
     moves = game.get_continue_moves()
+    if stats is not None:
+        stats.nodes += 1
+        stats.who_won_calls += 1
+        if not game.can_undo:
+            stats.copies += len(moves)
     if len(moves) == 0:
         expected_value = eval_func(game, player_number=player_number)
     else:
@@ -33,23 +42,34 @@ def complete_minimax(game, depth, eval_func, player_number=None, ans=None):
             min_or_max = min
         if depth == 0:
             # calculate the best move and the expected value for the original player
-            best_move, expected_value = min_or_max([(move, eval_func(game.get_moved_copy(move), player_number=player_number))
-                                                    for move in moves], key=lambda x: x[1].value)
+            move_values = []
+            for move in moves:
+                test_game = game.make_search_move(move)
+                move_values.append((move, eval_func(test_game, player_number=player_number)))
+                game.unmake_search_move(test_game)
+            best_move, expected_value = min_or_max(move_values, key=lambda x: x[1].value)
         else:
             test_games = []
             for move in moves:
-                test_game = game.get_moved_copy(move)
-                test_games.append((move, test_game.get_hash()))
-                lower_ans = complete_minimax(test_game, depth - 1, eval_func=eval_func,
-                                             player_number=player_number, ans=ans)
-                # keep the same values in ans while adding in the new ones
-                lower_ans.update(ans)
-                ans = lower_ans
+                test_game = game.make_search_move(move)
+                test_hash = test_game.get_canonical_hash()[0]
+                test_games.append((move, test_hash))
+                # when searching the entire game, positions (or symmetric versions of them) that were already
+                # ...solved through another order of moves don't need to be solved again
+                if depth >= 0 or test_hash not in ans:
+                    # the lower games add their values straight into ans
+                    complete_minimax(test_game, depth - 1, eval_func=eval_func, player_number=player_number, ans=ans,
+                                     stats=stats)
+                elif stats is not None:
+                    stats.cache_hits += 1
+                game.unmake_search_move(test_game)
             best_move, expected_value = min_or_max([(test_game_info[0], ans[test_game_info[1]][1])
                                                     for test_game_info in test_games],
                                                    key=lambda x: x[1].value)
 
-    ans[game.get_hash()] = (best_move, expected_value)
+    if best_move is not None:
+        best_move = game.move_to_canonical(best_move, symmetry)
+    ans[game_hash] = (best_move, expected_value)
     return ans
 
 
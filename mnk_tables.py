@@ -0,0 +1,134 @@
+'''
+Precomputed tables for small "k in a row" games played on a board with m rows and n columns, like tic-tac-toe.
+
+Boards are lists of the player in each cell (-1 for an empty cell), numbered left to right and then top to bottom.
+Each board has an index in base 3: a cell with the number i adds (player + 1) * 3 ** i to the index of the board.
+The tables are lists indexed by the board index, so looking something up about a board is a single list access.
+Every possible board gets an entry, so this only works for boards with at most MAX_CELLS cells.
+'''
+
+# 3 ** 12 is about half a million boards, which takes a few seconds to build
+MAX_CELLS = 12
+
+# cache of the tables for each size of board, in the form {(row amount, column amount, connect amount): tables, ...}
+_tables = {}
+
+
+def get_lines(row_amt, col_amt, connect_amt):
+    '''Return a list of the winning lines on the board, where each line is a tuple of cell numbers'''
+    lines = []
+    # (row direction, column direction) for rows, columns, and both diagonals
+    for row_shift, col_shift in [(0, 1), (1, 0), (1, 1), (1, -1)]:
+        for row_index in range(row_amt):
+            for col_index in range(col_amt):
+                end_row = row_index + row_shift * (connect_amt - 1)
+                end_col = col_index + col_shift * (connect_amt - 1)
+                if 0 <= end_row < row_amt and 0 <= end_col < col_amt:
+                    lines.append(tuple((row_index + row_shift * i) * col_amt + col_index + col_shift * i
+                                       for i in range(connect_amt)))
+    return lines
+
+
+def get_symmetries(row_amt, col_amt):
+    '''Return a list of the symmetries of the board, starting with the identity.
+
+    Each symmetry is a tuple of cell numbers where the cell i of the transformed board is the cell symmetry[i] of the board.
+    Square boards have 8 symmetries (rotations and reflections) and other boards have 4.
+    '''
+    def transform(get_position, new_col_amt):
+        '''Make a symmetry out of a function from the (row, column) of a transformed cell to the original cell'''
+        ans = []
+        for cell in range(row_amt * col_amt):
+            row_index, col_index = get_position(cell // new_col_amt, cell % new_col_amt)
+            ans.append(row_index * col_amt + col_index)
+        return tuple(ans)
+
+    last_row, last_col = row_amt - 1, col_amt - 1
+    symmetries = [transform(lambda r, c: (r, c), col_amt),
+                  transform(lambda r, c: (r, last_col - c), col_amt),
+                  transform(lambda r, c: (last_row - r, c), col_amt),
+                  transform(lambda r, c: (last_row - r, last_col - c), col_amt)]
+    if row_amt == col_amt:
+        # rotating a quarter turn or flipping over a diagonal only keeps the shape of square boards
+        symmetries += [transform(lambda r, c: (c, r), col_amt),
+                       transform(lambda r, c: (c, last_row - r), col_amt),
+                       transform(lambda r, c: (last_col - c, r), col_amt),
+                       transform(lambda r, c: (last_col - c, last_row - r), col_amt)]
+    return symmetries
+
+
+def get_inverse(symmetry):
+    '''Return the symmetry that undoes the given symmetry'''
+    ans = [0] * len(symmetry)
+    for cell, original_cell in enumerate(symmetry):
+        ans[original_cell] = cell
+    return tuple(ans)
+
+
+def get_board_index(board):
+    '''Return the base 3 index of a board'''
+    ans = 0
+    for val in reversed(board):
+        ans = ans * 3 + val + 1
+    return ans
+
+
+def get_symmetric_index(index, symmetry, powers):
+    '''Return the index of the board that the symmetry transforms the board with the given index into'''
+    digits = []
+    for _ in powers:
+        index, digit = divmod(index, 3)
+        digits.append(digit)
+    return sum([digits[original_cell] * power for original_cell, power in zip(symmetry, powers)])
+
+
+def get_tables(row_amt, col_amt, connect_amt):
+    '''Returns a tuple in the form (powers, winners, empty cells, swapped indexes) for a board of the given size
+
+    powers[i] is 3 ** i, which is how much a cell adds to the index of a board per player number (plus one)
+    winners[board index] is what Game.who_won should return for that board
+    empty cells[board index] is a tuple of the empty cells on that board, which are the possible moves
+    swapped indexes[board index] is the index of the board with the players swapped
+    '''
+    try:
+        return _tables[(row_amt, col_amt, connect_amt)]
+    except KeyError:
+        pass
+
+    cell_amt = row_amt * col_amt
+    if cell_amt > MAX_CELLS:
+        raise ValueError("A {} x {} board has too many cells to build tables for".format(row_amt, col_amt))
+
+    lines = get_lines(row_amt, col_amt, connect_amt)
+    powers = tuple(3 ** cell for cell in range(cell_amt))
+    winners = []
+    empty_cells = []
+    swapped_indexes = []
+    board = [-1] * cell_amt
+    for index in range(3 ** cell_amt):
+        if index:
+            # count up by one in base 3, which moves every cell through empty, player 0, and player 1
+            cell = 0
+            while board[cell] == 1:
+                board[cell] = -1
+                cell += 1
+            board[cell] += 1
+
+        winner = None
+        for line in lines:
+            player = board[line[0]]
+            if player != -1 and all(board[cell] == player for cell in line):
+                winner = player
+                break
+        empty = tuple(cell for cell in range(cell_amt) if board[cell] == -1)
+        if winner is None and not empty:
+            # the board is full, so it's a tie
+            winner = -1
+
+        winners.append(winner)
+        empty_cells.append(empty)
+        swapped_indexes.append(get_board_index([1 - val if val >= 0 else -1 for val in board]))
+
+    tables = (powers, winners, empty_cells, swapped_indexes)
+    _tables[(row_amt, col_amt, connect_amt)] = tables
+    return tables
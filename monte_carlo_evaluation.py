@@ -1,5 +1,9 @@
+import math
+
 from players import RandomPlayer
 from evaluation import Evaluation, get_winner_reward, WinnerRewardEvaluator
+from budget import BudgetExhausted
+from search_stats import SearchStats
 
 
 class MonteCarloEvaluation(Evaluation):
@@ -11,7 +15,8 @@ class MonteCarloEvaluation(Evaluation):
         return "MonteCarloEvaluation object with value: {} from {} simulations".format(self.value, self.simulations)
 
 def monte_carlo_eval(original_game, player_number, evaluator=WinnerRewardEvaluator((1, -1, .5)), simulation_amount=100,
-                     initial_depth=0, play_depth=-1, main_player=RandomPlayer(), opponent=RandomPlayer()):
+                     initial_depth=0, play_depth=-1, main_player=RandomPlayer(), opponent=RandomPlayer(), budget=None,
+                     known_value=None, stats=None):
     '''Returns a MonteCarloEvaluation object
     Plays moves from the given game position and averages the results
 
@@ -25,36 +30,91 @@ def monte_carlo_eval(original_game, player_number, evaluator=WinnerRewardEvaluat
     play_depth is the number of moves that are played out starting from each possible game at the specified initial depth
     ...(including opponents' moves)
     opponent is the  Player object we use to simulate the games of the player with the number that's not player_number
+    budget is a Budget that each simulated game is spent from (see the budget module)
+    ...if it runs out, BudgetExhausted is raised and moves made in games that can undo are left for the caller to undo
+
+    known_value is a function called like known_value(game, player_number) that returns the value of games whose
+    ...results are already known (like ones that position evaluation proved) and None for other games;
+    ...games with a known value are scored with it instead of being explored or simulated
+    stats is a SearchStats that the work is counted in (see the search_stats module)
+
+    When the games are played out randomly to the end and scored by who won, games that can play many random games
+    ...at once (see Game.get_random_playout_counts) play all of the simulations in one batch.
     '''
+    if known_value is not None:
+        value = known_value(original_game, player_number)
+        if value is not None:
+            if stats is not None:
+                stats.cache_hits += 1
+            return MonteCarloEvaluation(value, simulation_amount)
+
+    if (play_depth == -1 and isinstance(evaluator, WinnerRewardEvaluator) and
+            type(main_player) is RandomPlayer and type(opponent) is RandomPlayer):
+        evaluation = batched_monte_carlo_eval(original_game, player_number, evaluator, simulation_amount,
+                                              initial_depth, budget, known_value, stats)
+        if evaluation is not None:
+            return evaluation
+
+    if stats is not None:
+        stats.nodes += 1
     if initial_depth == 0:
+        # set up the players
+        players = [None, None]
+        players[player_number] = main_player
+        players[original_game.get_other_player(player_number)] = opponent
+
         value = 0
         for _ in range(simulation_amount):
-            game = original_game.get_copy()
-            # set up the players
-            players = [None, None]
-            players[player_number] = main_player
-            players[original_game.get_other_player(player_number)] = opponent
+            if budget is not None:
+                budget.spend()
+            if original_game.can_undo:
+                # play out the game in place and undo the moves afterwards
+                game = original_game
+                undo_point = game.get_undo_point()
+            else:
+                game = original_game.get_copy()
 
             # play out a game
+            moves_left = play_depth
             while game.who_won() is None:
-                if play_depth > 0:
-                    play_depth -= 1
-                elif play_depth == 0:
+                if moves_left > 0:
+                    moves_left -= 1
+                elif moves_left == 0:
                     break
                 players[game.active_player].make_move(game)
 
             # update the value
             value += evaluator.evaluate(game, player_number).value
 
+            if stats is not None:
+                # the moves are counted from the undo journal so that the loop above doesn't slow down
+                stats.playouts += 1
+                if game is original_game:
+                    plies = len(game.undo_journal) - undo_point
+                    stats.playout_plies += plies
+                    stats.who_won_calls += plies + 1
+                else:
+                    stats.copies += 1
+            if game is original_game:
+                game.undo_to(undo_point)
+
         # average the games' scores
         return MonteCarloEvaluation(value / simulation_amount, simulation_amount)
     else:
         winner = original_game.who_won()
+        if stats is not None:
+            stats.who_won_calls += 1
         if winner is None:
             # list of MonteCarloEvaluation objects for each game
-            lower_level = [monte_carlo_eval(game, player_number, evaluator, simulation_amount,
-                                            initial_depth - 1, play_depth, main_player, opponent)
-                           for game in original_game.get_next_level()]
+            lower_level = []
+            for move in original_game.get_continue_moves():
+                game = original_game.make_search_move(move)
+                if stats is not None and game is not original_game:
+                    stats.copies += 1
+                lower_level.append(monte_carlo_eval(game, player_number, evaluator, simulation_amount,
+                                                    initial_depth - 1, play_depth, main_player, opponent, budget,
+                                                    known_value, stats))
+                original_game.unmake_search_move(game)
             # average the values across the same level
             return MonteCarloEvaluation(sum([evaluation.value for evaluation in lower_level]) / len(lower_level),
                                         sum([evaluation.simulations for evaluation in lower_level]))
@@ -64,6 +124,166 @@ def monte_carlo_eval(original_game, player_number, evaluator=WinnerRewardEvaluat
                                         simulation_amount)
 
 
+def batched_monte_carlo_eval(original_game, player_number, evaluator, simulation_amount, initial_depth, budget=None,
+                             known_value=None, stats=None):
+    '''Returns the same MonteCarloEvaluation as monte_carlo_eval with random players playing to the end,
+    but plays all of the simulations for every game at the initial depth in one call to get_random_playout_counts
+    Returns None if the game doesn't have a way to play random games in batches.
+    '''
+    # unfinished games at the initial depth that need to be simulated
+    leaves = []
+    # the work is only added to stats if the batch can be played (otherwise monte_carlo_eval does it all again)
+    if stats is not None:
+        batch_stats = stats
+        stats = SearchStats()
+
+    def get_plan(game, depth):
+        '''Returns a tuple in the form (value, None) for a finished game, (None, leaf index) for an unfinished game
+        at the initial depth, or a list of the plans for each move for a game above the initial depth'''
+        if stats is not None:
+            stats.nodes += 1
+            stats.who_won_calls += 1
+        if game.who_won() is not None:
+            return evaluator.evaluate(game, player_number).value, None
+        if known_value is not None:
+            value = known_value(game, player_number)
+            if value is not None:
+                if stats is not None:
+                    stats.cache_hits += 1
+                return value, None
+        if depth == 0:
+            leaves.append(game.get_copy())
+            return None, len(leaves) - 1
+        plans = []
+        for move in game.get_possible_moves():
+            test_game = game.make_search_move(move)
+            if stats is not None and test_game is not game:
+                stats.copies += 1
+            plans.append(get_plan(test_game, depth - 1))
+            game.unmake_search_move(test_game)
+        return plans
+
+    plan = get_plan(original_game, initial_depth)
+    # how many games are simulated from each leaf (fewer than simulation_amount if that's all the budget has left)
+    batch_amount = simulation_amount
+    if leaves:
+        if budget is not None:
+            # the budget is checked before the batch is played, since a batch can't be stopped partway through
+            if budget.exhausted():
+                raise BudgetExhausted()
+            nodes_left = budget.get_nodes_left()
+            if nodes_left is not None:
+                batch_amount = min(simulation_amount, nodes_left // len(leaves))
+                if batch_amount == 0:
+                    raise BudgetExhausted()
+        counts = type(original_game).get_random_playout_counts(leaves, batch_amount)
+        if counts is None:
+            return None
+        if budget is not None:
+            # the games are already played, so they're kept even if they went over the time limit
+            # ...(the next thing spent from the budget raises BudgetExhausted instead)
+            budget.exhausted(len(leaves) * batch_amount)
+        if stats is not None:
+            # (the batches don't say how many moves they made)
+            stats.copies += len(leaves)
+            stats.playouts += len(leaves) * batch_amount
+        # the counts are in the form [player 0 wins, player 1 wins, ties], and the winners are 0, 1, and -1
+        rewards = [get_winner_reward(winner, player_number, evaluator.rewards) for winner in (0, 1, -1)]
+        leaf_values = [sum([count * reward for count, reward in zip(leaf_counts, rewards)]) / batch_amount
+                       for leaf_counts in counts]
+    if stats is not None:
+        batch_stats.add(stats)
+
+    def get_evaluation(plan):
+        '''Average the values from the plan the same way monte_carlo_eval does'''
+        if isinstance(plan, tuple):
+            value, leaf_index = plan
+            if leaf_index is not None:
+                return MonteCarloEvaluation(leaf_values[leaf_index], batch_amount)
+            return MonteCarloEvaluation(value, simulation_amount)
+        lower_level = [get_evaluation(lower_plan) for lower_plan in plan]
+        return MonteCarloEvaluation(sum([evaluation.value for evaluation in lower_level]) / len(lower_level),
+                                    sum([evaluation.simulations for evaluation in lower_level]))
+
+    return get_evaluation(plan)
+
+
+def monte_carlo_move_values(game, moves, player_number, budget=None, max_rounds=None, **kwargs):
+    '''Returns a list of the average value of the monte_carlo_eval of each move in moves (None if a move wasn't simulated)
+    The moves are simulated in rounds: each round runs monte_carlo_eval once on the game after each move
+    ...and rounds keep going until the budget runs out or max_rounds rounds are done (at least one has to be given).
+    Averaging over rounds means the values get more accurate the more time there is, and can be stopped at any time.
+    kwargs are passed on to monte_carlo_eval
+    '''
+    if budget is None and max_rounds is None:
+        raise ValueError("monte_carlo_move_values needs a budget or max_rounds, or it would never stop")
+    totals = [0] * len(moves)
+    simulations = [0] * len(moves)
+    undo_point = game.get_undo_point()
+    rounds = 0
+    try:
+        while max_rounds is None or rounds < max_rounds:
+            for i, move in enumerate(moves):
+                test_game = game.make_search_move(move)
+                evaluation = monte_carlo_eval(test_game, player_number, budget=budget, **kwargs)
+                game.unmake_search_move(test_game)
+                totals[i] += evaluation.value * evaluation.simulations
+                simulations[i] += evaluation.simulations
+            rounds += 1
+    except BudgetExhausted:
+        # put back any moves that were being simulated in place
+        game.undo_to(undo_point)
+    return [total / simulation_amount if simulation_amount else None
+            for total, simulation_amount in zip(totals, simulations)]
+
+
+def successive_halving_move(game, moves, player_number, total_simulations, budget=None, **kwargs):
+    '''Returns the move in moves with the best monte carlo value, splitting total_simulations between the moves
+    ...with successive halving instead of giving every move the same amount
+
+    Every round gives each move that's still in the running an equal share of the round's simulations
+    ...and then drops the worse half of them (by their average value over all of their simulations so far),
+    ...until only one move is left. There are as many rounds as it takes to get down to one move,
+    ...and each round gets an equal share of total_simulations, so moves that are clearly bad stop using simulations early
+    ...and most of the simulations go into telling the best few moves apart.
+    Each move gets at least 1 simulation a round, so very small totals can be overspent.
+
+    total_simulations counts the simulation_amount passed to each monte_carlo_eval
+    ...(with an initial_depth, each of those simulations is run from every game at the initial depth)
+    budget is a Budget that each simulated game is spent from (see the budget module)
+    ...if it runs out, the move with the best average among the ones still in the running is returned
+    kwargs are passed on to monte_carlo_eval
+    '''
+    if len(moves) == 1:
+        return moves[0]
+    totals = [0] * len(moves)
+    simulations = [0] * len(moves)
+    remaining = list(range(len(moves)))
+    round_amt = math.ceil(math.log2(len(moves)))
+    undo_point = game.get_undo_point()
+    try:
+        while len(remaining) > 1:
+            simulation_amount = max(1, total_simulations // (len(remaining) * round_amt))
+            for i in remaining:
+                test_game = game.make_search_move(moves[i])
+                evaluation = monte_carlo_eval(test_game, player_number, simulation_amount=simulation_amount,
+                                              budget=budget, **kwargs)
+                game.unmake_search_move(test_game)
+                totals[i] += evaluation.value * evaluation.simulations
+                simulations[i] += evaluation.simulations
+            # keep the better half (rounded up)
+            remaining.sort(key=lambda i: totals[i] / simulations[i], reverse=True)
+            remaining = remaining[:(len(remaining) + 1) // 2]
+    except BudgetExhausted:
+        # put back any moves that were being simulated in place
+        game.undo_to(undo_point)
+    # (if the budget ran out during the first round, some of the moves might not have been simulated)
+    simulated = [i for i in remaining if simulations[i]]
+    if not simulated:
+        return moves[remaining[0]]
+    return moves[max(simulated, key=lambda i: totals[i] / simulations[i])]
+
+
 if __name__ == "__main__":
     from tic_tac_toe import TicTacToe
     from connect_four import ConnectFour
@@ -0,0 +1,166 @@
+# alpha-beta negamax with a transposition table
+from evaluation import Evaluation
+
+# the flags for the values in the transposition table
+# an exact value, a value the real value is at least (a lower bound), or a value the real value is at most (an upper bound)
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# the depth of searches that go all the way to the end of the game
+# subtracting 1 from it leaves it the same, so those searches never stop early
+SOLVED = float("inf")
+
+
+class NegamaxSearcher:
+    '''Searches games with alpha-beta pruning, remembering what it finds in a transposition table
+
+    The same searcher can be used for many searches of the same game (from any position),
+    ...and later searches reuse everything the earlier ones found.
+    '''
+
+    def __init__(self, eval_func, player_number=None):
+        '''
+        eval_func is called like eval_func(game, player_number=player_number) and returns an Evaluation
+        It needs to be zero-sum: the value for one player should be the negative of the value for the other player.
+        Evaluations with a value of None (like a WinnerRewardEvaluator gives unfinished games) are treated as 0.
+        player_number is the player whose point of view the returned values are from
+        ...and is the active player of each searched game if it's None
+
+        self.table is the transposition table in the form
+        {canonical game hash: (depth, flag, value for the active player, best canonical move), ...}
+        where depth is how many moves deep the position was searched (SOLVED if it was searched to the end of the game)
+        and flag is EXACT, LOWER, or UPPER
+        self.history is how many times each move caused a cutoff, which is used to try good moves first
+        self.stats is a SearchStats that the work is counted in (None to not count it; see the search_stats module)
+        '''
+        self.eval_func = eval_func
+        self.player_number = player_number
+        self.table = {}
+        self.history = {}
+        self.stats = None
+
+    def search(self, game, depth=-1):
+        '''Returns a dictionary in the same form complete_minimax returns:
+        {canonical game hash: (best canonical move for the active player,
+                               expected value of the move for the searcher's player), ...}
+
+        The game is searched `depth` moves deep (or to the end of the game if `depth` is -1),
+        ...one move deeper at a time so that each search can try the best moves of the one before it first.
+        Unlike complete_minimax, the dictionary only includes the positions whose exact values were found;
+        ...the rest were pruned, but the given position is always included.
+        '''
+        player_number = self.player_number
+        if player_number is None:
+            player_number = game.active_player
+        max_depth = SOLVED if depth < 0 else max(depth, 1)
+
+        iteration_depth = 0
+        solved = False
+        while iteration_depth < max_depth and not solved:
+            iteration_depth += 1
+            # only keep the answers from the deepest search
+            self.ans = {}
+            _, solved = self.negamax(game, iteration_depth, float("-inf"), float("inf"), player_number)
+        return self.ans
+
+    def negamax(self, game, depth, alpha, beta, player_number):
+        '''Returns a tuple in the form (value of the game for the active player, whether the value is solved)
+        where a solved value came from searching to the end of the game, so it doesn't depend on the depth
+
+        The value is only exact if it is strictly between alpha and beta;
+        ...otherwise it's a bound that is enough to show that this position won't be chosen.
+        '''
+        # the values are for the active player, so flip the values for player_number when the opponent is moving
+        sign = 1 if game.active_player == player_number else -1
+        stats = self.stats
+        if stats is not None:
+            stats.nodes += 1
+            stats.who_won_calls += 1
+
+        if game.who_won() is not None:
+            return sign * self.eval_func(game, player_number=player_number).value, True
+        if depth == 0:
+            value = self.eval_func(game, player_number=player_number).value
+            if value is None:
+                return 0, False
+            return sign * value, False
+
+        game_hash, symmetry = game.get_canonical_hash()
+        entry = self.table.get(game_hash)
+        best_canonical_move = None
+        if entry is not None:
+            entry_depth, flag, value, best_canonical_move = entry
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    self.ans[game_hash] = (best_canonical_move, Evaluation(sign * value))
+                    if stats is not None:
+                        stats.cache_hits += 1
+                    return value, entry_depth == SOLVED
+                if (flag == LOWER and value >= beta) or (flag == UPPER and value <= alpha):
+                    if stats is not None:
+                        stats.cache_hits += 1
+                    return value, entry_depth == SOLVED
+
+        # try the best move from an earlier search first, and then the moves that caused the most cutoffs
+        history = self.history
+        moves = sorted(game.get_possible_moves(), key=lambda move: history.get(move, 0), reverse=True)
+        if best_canonical_move is not None:
+            first_move = game.canonical_to_move(best_canonical_move, symmetry)
+            moves.remove(first_move)
+            moves.insert(0, first_move)
+
+        original_alpha = alpha
+        best_value = None
+        best_move = None
+        solved = True
+        for move in moves:
+            test_game = game.make_search_move(move)
+            if stats is not None and test_game is not game:
+                stats.copies += 1
+            value, move_solved = self.negamax(test_game, depth - 1, -beta, -alpha, player_number)
+            game.unmake_search_move(test_game)
+            # the value was for the other player
+            value = -value
+            solved = solved and move_solved
+            if best_value is None or value > best_value:
+                best_value = value
+                best_move = move
+            if value > alpha:
+                alpha = value
+            if alpha >= beta:
+                # the opponent would never let the game get here, so the other moves don't matter
+                history[move] = history.get(move, 0) + 1
+                break
+
+        if best_value <= original_alpha:
+            flag = UPPER
+        elif best_value >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        entry_depth = SOLVED if solved else depth
+        best_canonical_move = game.move_to_canonical(best_move, symmetry)
+        # don't replace what a deeper search found with what a shallower one found
+        if entry is None or entry_depth >= entry[0]:
+            self.table[game_hash] = (entry_depth, flag, best_value, best_canonical_move)
+        if flag == EXACT:
+            self.ans[game_hash] = (best_canonical_move, Evaluation(sign * best_value))
+        return best_value, solved
+
+
+def negamax(game, depth, eval_func, player_number=None):
+    '''A drop in replacement for complete_minimax that prunes the moves that can't change the result
+    See NegamaxSearcher.search for what it returns
+    '''
+    return NegamaxSearcher(eval_func, player_number).search(game, depth)
+
+
+if __name__ == "__main__":
+    from sizeable_connect_x import SizeableConnectX
+    from evaluation import WinnerRewardEvaluator
+
+    # solves 4 x 5 connect 4 (it's a tie)
+    game = SizeableConnectX(4, 5, 4)
+    ans = negamax(game, -1, WinnerRewardEvaluator((1, -1, 0)).evaluate)
+    print(ans[game.get_canonical_hash()[0]][1])
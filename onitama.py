@@ -2,31 +2,74 @@
 By London Lowmanstone
 Class for Onitama
 '''
-from copy import deepcopy
 import random
 from game import Game
 from evaluation import Evaluator, Evaluation
 
 STUDENT_STYLE = "student"
 SENSEI_STYLE = "*sensei"
-MIDDLE_CARD_INDEX = 2
 
 PLAYERS = (0, 1)
 
+# positions are (x, y) with both coordinates from 1 to 5; player 0 starts on row 1, the bottom row
 ENEMY_ARCH_POSITIONS = ((3, 5), (3, 1))
 
-class InvalidMoveError(RuntimeError):
-    pass
+# set this to True to check the state of every game after each move (this makes the games much slower)
+CHECK_STATE = False
+
+# the indexes of the different parts of the state (see Onitama.get_initial_state)
+PAWNS_INDEX = 0
+SENSEI_INDEX = 2
+HAND_INDEX = 4
+MIDDLE_CARD_INDEX = 6
+
+# the sensei position of a player whose sensei has been captured
+CAPTURED = -1
+
+
+def position_to_square(position):
+    '''Convert an (x, y) position into the number of its square on the board (from 0 to 24)'''
+    return (position[1] - 1) * 5 + position[0] - 1
+
+
+def square_to_position(square):
+    '''Convert the number of a square on the board into its (x, y) position'''
+    return (square % 5 + 1, square // 5 + 1)
+
+
+def rotate_pawns(pawns):
+    '''Return a pawn mask turned around 180 degrees, as the other player sees the board'''
+    # square s becomes square 24 - s, which just reverses the 25 bits
+    return int(format(pawns, "025b")[::-1], 2)
+
+
+def rotate_square(square):
+    '''Return a square turned around 180 degrees, as the other player sees the board'''
+    if square == CAPTURED:
+        return CAPTURED
+    return 24 - square
+
+
+def get_squares(pawns):
+    '''Return a list of the squares that are set in a pawn mask'''
+    ans = []
+    while pawns:
+        bit = pawns & -pawns
+        ans.append(bit.bit_length() - 1)
+        pawns ^= bit
+    return ans
+
+
+ENEMY_ARCH_SQUARES = tuple(position_to_square(position) for position in ENEMY_ARCH_POSITIONS)
+
 
 class Card:
     def __init__(self, name, moves):
         self.name = name
         # [move, ...]
-        # where a move is [direction to move pawn, ...]
-        # for example, moving to the top right would be [(1, -1)] and moving right 2 spaces would be [(1, 0), (1, 0)]
-        # the moves have to be done in a way that if any move in the sequence would go off the board
-        # ...the final move would go off the board
-        # this just means that the moves can't backtrack, since the board is rectangular
+        # where a move is the (x, y) direction to move a pawn for player 0
+        # for example, moving to the top right would be (1, 1) and moving right 2 spaces would be (2, 0)
+        # the moves are flipped for player 1, who sits on the other side of the board
         self.moves = moves
 
     def __str__(self):
@@ -35,8 +78,23 @@ class Card:
 
         return f"<Card - {self.name}: {cut_edges(str(self.moves))}>"
 
-    def __deepcopy__(self, memo):
-        return type(self)(deepcopy(self.name, memo), deepcopy(self.moves, memo))
+    def get_targets(self, player):
+        '''Returns a tuple in the form (targets from square 0, ..., targets from square 24)
+        where each item is a tuple of the squares a pawn of the player on that square can move to with this card
+        '''
+        ans = []
+        for square in range(25):
+            x, y = square_to_position(square)
+            targets = []
+            for card_move in self.moves:
+                if player == 1:
+                    # card moves for player 1 are flipped
+                    card_move = tuple(-1 * coord for coord in card_move)
+                target = (x + card_move[0], y + card_move[1])
+                if 1 <= target[0] <= 5 and 1 <= target[1] <= 5:
+                    targets.append(position_to_square(target))
+            ans.append(tuple(targets))
+        return tuple(ans)
 
 crab_card = Card("Crab", [(0, 1), (-2, 0), (2, 0)])
 rabbit_card = Card("Rabbit", [(-1, -1), (1, 1), (2, 0)])
@@ -44,157 +102,94 @@ frog_card = Card("Frog", [(1, -1), (-1, 1), (-2, 0)])
 goose_card = Card("Goose", [(-1, 0), (1, 0), (-1, 1), (1, -1)])
 eel_card = Card("Eel", [(-1, 1), (-1, -1), (1, 0)])
 
+# cards are referred to by their index in this tuple
+CARDS = (crab_card, rabbit_card, frog_card, goose_card, eel_card)
 
-class Pawn:
-    def __init__(self, position, style, board, player, index):
-        self.position = position
-        self.style = style
-        self.board = board
-        self.player = player
-        self.index = index
-        self.update_board()
+# the squares a pawn can move to, indexed by [card index][player][square the pawn is on]
+TARGETS = tuple(tuple(card.get_targets(player) for player in PLAYERS) for card in CARDS)
 
-    def __str__(self):
-        return f"<Player {self.player}'s {self.style} pawn at {self.position}>"
-
-    def __deepcopy__(self, memo):
-        return type(self)(deepcopy(self.position, memo), deepcopy(self.style, memo),
-                          deepcopy(self.board, memo), deepcopy(self.player, memo),
-                          deepcopy(self.index, memo))
-
-    def update_board(self, previous_position=None):
-        if previous_position:
-            assert previous_position != self.position, f"Pawn did not move from {previous_position}"
-            del self.board[previous_position]
-        self.board[self.position] = self
-
-    def check_move(self, card_move):
-        # new position
-        if self.player == 1:
-            # card moves for player 1 are flipped
-            card_move = tuple(-1 * coord for coord in card_move)
-
-        target = tuple(sum(coord) for coord in zip(self.position, card_move))
-        assert target != self.position, f"Target {target} would not move {self}"
-        for coord in target:
-            if not (1 <= coord <= 5):
-                # target position is not on the board
-                raise InvalidMoveError
-
-        captured_pawn = self.board.get(target, None)
-
-        # convert to boolean
-        if captured_pawn:
-            capture = True
-            if captured_pawn.player == self.player:
-                raise InvalidMoveError
-        else:
-            capture = False
-
-        return target, capture
-
-    def move(self, target):
-        '''Move the pawn to a position on the board'''
-        # TODO delete
-        previous_position = self.position
-        self.position = target
-        self.update_board(previous_position)
-        assert self.board[self.position] == self
-        assert previous_position not in self.board
-
-class State:
-    def __init__(self, hands, board, pawns, sensei_pawns):
-        self.board = board
-        # player 0, player 1, middle
-        self.hands = hands
-        self.pawns = pawns
-        self.sensei_pawns = sensei_pawns
+
+class Onitama(Game):
+    can_undo = True
 
     def __str__(self):
+        return f"PLayer {self.active_player}'s turn.\n{self.get_state_string()}\n"
+
+    def get_state_string(self):
+        '''Return a human-understandable string for the board and the cards'''
         ans = ""
         ans += "Board:\n"
 
-        def get_symbol(pawn):
-            if pawn.player == 0:
-                symbol = "r"
-            else:
-                symbol = "b"
-            if pawn.style == SENSEI_STYLE:
-                symbol = symbol.upper()
-            return symbol
-
-        def position_to_index(position):
-            row = 5 - position[1]
-            column = position[0] - 1
-            return (row, column)
-
         display_board = []
         for row_index in range(5):
             display_board.append(["."] * 5)
 
-        for position, pawn in self.board.items():
-            row_index, column_index = position_to_index(position)
-            symbol = get_symbol(pawn)
-            display_board[row_index][column_index] = symbol
-            # TODO delete
-            # ans += f"{position}: {str(pawn)}\n"
+        for player, symbol in zip(PLAYERS, ["r", "b"]):
+            for square in get_squares(self.state[PAWNS_INDEX + player]):
+                if square == self.state[SENSEI_INDEX + player]:
+                    square_symbol = symbol.upper()
+                else:
+                    square_symbol = symbol
+                # the top row is printed first
+                x, y = square_to_position(square)
+                display_board[5 - y][x - 1] = square_symbol
 
         for row in display_board:
             ans += "".join(row) + "\n"
-        # ans += str(display_board) + "\n"
 
         ans += "\nHands:"
         for player in PLAYERS:
-            hand = self.hands[player]
-            ans += f"\nPlayer {player}'s hand:\n{str(hand[0])}\n{str(hand[1])}\n"
+            hand = self.state[HAND_INDEX + player]
+            ans += f"\nPlayer {player}'s hand:\n{str(CARDS[hand[0]])}\n{str(CARDS[hand[1]])}\n"
 
-        ans += f"\nMiddle card:\n{str(self.hands[MIDDLE_CARD_INDEX])}\n"
+        ans += f"\nMiddle card:\n{str(CARDS[self.state[MIDDLE_CARD_INDEX]])}\n"
         return ans
 
-    def __deepcopy__(self, memo):
-        return type(self)(deepcopy(self.hands, memo), deepcopy(self.board, memo),
-                          deepcopy(self.pawns, memo), deepcopy(self.sensei_pawns, memo))
-
-class Onitama(Game):
-    def __str__(self):
-        return f"PLayer {self.active_player}'s turn.\n{str(self.state)}\n"
-
     def get_initial_state(self):
-        '''Return the initial state of the game.
-        The state can be anything (object, string, number, etc.).
-        '''
-        hands = [[crab_card, rabbit_card], [goose_card, eel_card], frog_card]
+        '''The state is a tuple in the form
+        (player 0's pawns, player 1's pawns, player 0's sensei, player 1's sensei, player 0's hand, player 1's hand, middle card)
 
+        Pawns are 25 bit masks with a bit set for each square (see position_to_square) a player has a pawn on.
+        The sensei are the squares the players' sensei pawns are on (or CAPTURED).
+        Hands are sorted tuples of two card indexes (see CARDS) and the middle card is a card index.
+        The state is never changed, only replaced, so copies can share it.
+        '''
         SENSEI_COLUMN = 3
-        SENSEI_INDEX = 4
         STUDENT_COLUMNS = [1, 2, 4, 5]
-        board = {}
-        pawns = {0: [], 1: []}
-        sensei_pawns = {}
+        pawns = []
+        sensei = []
         for player in PLAYERS:
             # player 0 is on row 1, the bottom row
             # player 1 is on row 5, the top row
             row = player * 4 + 1
+            player_pawns = 0
+            for column in STUDENT_COLUMNS + [SENSEI_COLUMN]:
+                player_pawns |= 1 << position_to_square((column, row))
+            pawns.append(player_pawns)
+            sensei.append(position_to_square((SENSEI_COLUMN, row)))
 
-            # place students
-            for index, column in enumerate(STUDENT_COLUMNS):
-                # x, y
-                position = (column, row)
-                pawns[player].append(Pawn(position, STUDENT_STYLE, board, player, index))
+        hands = [(CARDS.index(crab_card), CARDS.index(rabbit_card)),
+                 (CARDS.index(goose_card), CARDS.index(eel_card))]
+        return (pawns[0], pawns[1], sensei[0], sensei[1], hands[0], hands[1], CARDS.index(frog_card))
 
-            # place sensei
-            position = (SENSEI_COLUMN, row)
-            sensei_pawn = Pawn(position, SENSEI_STYLE, board, player, SENSEI_INDEX)
-            pawns[player].append(sensei_pawn)
-            sensei_pawns[player] = sensei_pawn
+    def get_state_hash(self):
+        '''Return a unique integer for the state.
+        The board, the hands, and the middle card are packed into the bits of the integer, so no two states share a hash.
+        '''
+        return self.get_hash_of_state(self.state)
 
-        return State(hands, board, pawns, sensei_pawns)
+    def get_swapped_state_hash(self):
+        '''Return the state hash the game would have after swap_players'''
+        return self.get_hash_of_state(self.get_swapped_state(self.state))
 
-    def get_state_hash(self):
-        '''Return a unique string for the state.
-        Only needed for players trying to solve the game,
-        ...so I will not be implementing it (smartly) for this class.'''
-        return hash(self.state)
+    @classmethod
+    def get_hash_of_state(cls, state):
+        '''Return the unique integer for a state (see get_state_hash)'''
+        pawns0, pawns1, sensei0, sensei1, hand0, hand1, middle_card = state
+        # 25 bits for each player's pawns, 5 bits for each sensei (CAPTURED becomes 0)
+        # ...3 bits for the middle card and 5 bits for player 0's hand; player 1 has the other two cards
+        return (pawns0 | pawns1 << 25 | (sensei0 + 1) << 50 | (sensei1 + 1) << 55 |
+                middle_card << 60 | (hand0[0] * len(CARDS) + hand0[1]) << 63)
 
     def get_json_dict(self):
         '''Get the json for this game in such a way that the browser can display it.
@@ -205,151 +200,149 @@ class Onitama(Game):
         '''
         raise NotImplementedError
 
-    def swap_players(self):
-        '''Swap the players in a game; returns nothing
-        This is never used, so I'm not implementing it.'''
-        # new_hands = (self.hands[1], self.hands[0], self.hands[MIDDLE_CARD_INDEX])
-        # self.state.hands = new_hands
-        # new_pawns = {0: [], 1: []}
-        # for pawns if self.state.pawns:
-        #     for pawn in self.state.pawns:
-        raise NotImplementedError
+    @classmethod
+    def get_swapped_state(cls, state):
+        '''Return the state with the players swapped.
+        The board is turned around so that each player keeps playing in their own direction.
+        '''
+        pawns0, pawns1, sensei0, sensei1, hand0, hand1, middle_card = state
+        return (rotate_pawns(pawns1), rotate_pawns(pawns0), rotate_square(sensei1), rotate_square(sensei0),
+                hand1, hand0, middle_card)
 
-    def _assert_pawns_in_board(self):
-        for pawns in self.state.pawns.values():
-            for pawn in pawns:
-                assert pawn.position in self.state.board, f"Pawn {pawn} disappeared from the board {board_to_string(self.state.board)}"
+    def swap_players(self):
+        '''Swap the players in a game; returns nothing'''
+        self.state = self.get_swapped_state(self.state)
+        # swap the remembered states too so that moves can still be unmade
+        self.undo_journal = [self.get_swapped_state(state) for state in self.undo_journal]
+
+    def _assert_state(self):
+        '''Check that the state is consistent; only called when CHECK_STATE is True'''
+        pawns0, pawns1, sensei0, sensei1, hand0, hand1, middle_card = self.state
+        assert not pawns0 & pawns1, "Two pawns are on the same square"
+        for pawns, sensei in [(pawns0, sensei0), (pawns1, sensei1)]:
+            assert len(get_squares(pawns)) <= 5, "A player has too many pawns"
+            assert sensei == CAPTURED or pawns & (1 << sensei), f"Sensei disappeared from the board at {sensei}"
+        assert sorted(hand0 + hand1 + (middle_card,)) == list(range(len(CARDS))), "Cards were lost or duplicated"
 
     def _assert_move(self, move):
         card_index, position, target, capture = move
         assert target != position, f"The pawn must actually move from {position}"
+        assert card_index in self.state[HAND_INDEX + self.active_player], f"{CARDS[card_index]} is not in the hand"
+        assert self.state[PAWNS_INDEX + self.active_player] & (1 << position), f"There is no pawn at {position}"
 
     def get_copy(self):
         '''Return a copy of the object'''
-        copy = Onitama()
-        copy.state = deepcopy(self.state)
-        copy.active_player = self.active_player
-        copy._assert_pawns_in_board()
-        for pawns in self.state.pawns.values():
-            for pawn in pawns:
-                for copy_pawns in copy.state.pawns.values():
-                    for copy_pawn in copy_pawns:
-                        assert id(copy_pawn.board) == id(copy.state.board), "Pawn did not inherit correct board"
-                        assert pawn != copy_pawn
-                        assert pawn.board != copy_pawn.board
-                        assert id(pawn) != id(copy_pawn)
-                        # TODO delete
-                        # print("Pair:")
-                        # print(id(pawn))
-                        # print(id(copy_pawn))
-                        # print()
-        assert id(copy.state.board) != id(self.state.board)
-        # TODO delete
-        # print("ids")
-        # print(f"original: {id(self.state.board)}")
-        # print(f"copy:     {id(copy.state.board)}")
-        return copy
+        # the state is never changed in place, so it can be shared
+        return Onitama((self.state, self.active_player))
 
     def get_possible_moves(self):
         '''Return a list of the possible moves that can be taken by the active player in the current state.
         Behavior is undefined when the game is complete.
-        A single move can be anything (object, string, number, etc.),
-        ...but it must be a valid move in any copy of the game as well.
+        A move is a tuple in the form (card index, square of the pawn, square to move to, whether or not it captures)
         '''
-        self._assert_pawns_in_board()
+        player = self.active_player
+        own_pawns = self.state[PAWNS_INDEX + player]
+        opponent_pawns = self.state[PAWNS_INDEX + Game.get_other_player(player)]
+        own_squares = get_squares(own_pawns)
         ans = []
-        hand = self.state.hands[self.active_player]
-        for card_index, card in enumerate(hand):
-            for card_move in card.moves:
-                for pawn in self.state.pawns[self.active_player]:
-                    try:
-                        pawn_target, capture = pawn.check_move(card_move)
-                    except InvalidMoveError:
-                        continue
-                    move = (card_index, pawn.position, pawn_target, capture)
-                    self._assert_move(move)
-                    ans.append(move)
-        self._assert_pawns_in_board()
-        for move in ans:
-            self._assert_move(move)
+        for card_index in self.state[HAND_INDEX + player]:
+            card_targets = TARGETS[card_index][player]
+            for square in own_squares:
+                for target in card_targets[square]:
+                    target_bit = 1 << target
+                    # pawns can't move onto their own player's pawns
+                    if not own_pawns & target_bit:
+                        ans.append((card_index, square, target, bool(opponent_pawns & target_bit)))
         return ans
 
     def make_move(self, action):
         '''Change the state of the game and update the active player based on the action.
         Assumes the action is valid. Behavior is undefined if action is not valid.
         '''
-        # TODO delete
-        # print("-------- MAKING MOVE ---------")
-        # print("----------BOARD----------")
-        # print(f"(board id is {id(self.state.board)})")
-        # print(board_to_string(self.state.board))
-        # print("-----GAME:------")
-        # print(self)
-        # print("-------MOVE-------")
-        # print(move_to_string(action))
-        assert len(self.state.sensei_pawns) == 2, "Invalid move - game is already over"
-        self._assert_pawns_in_board()
-        self._assert_move(action)
+        if CHECK_STATE:
+            assert self.who_won() is None, "Invalid move - game is already over"
+            self._assert_move(action)
 
         card_index, position, target, capture = action
-        opponent = Game.get_other_player(self.active_player)
-        active_player_hand = self.state.hands[self.active_player]
-
-        active_player_hand.append(self.state.hands[MIDDLE_CARD_INDEX])
-        used_card = active_player_hand.pop(card_index)
-        self.state.hands[MIDDLE_CARD_INDEX] = used_card
+        player = self.active_player
+        opponent = Game.get_other_player(player)
+        new_state = list(self.state)
 
+        new_state[PAWNS_INDEX + player] ^= (1 << position) | (1 << target)
+        if new_state[SENSEI_INDEX + player] == position:
+            new_state[SENSEI_INDEX + player] = target
         if capture:
-            captured_pawn = self.state.board[target]
-            opponent_pawns = self.state.pawns[Game.get_other_player(self.active_player)]
-            removed_pawn = opponent_pawns.pop(captured_pawn.index)
-            assert removed_pawn == captured_pawn, f"{removed_pawn} != {captured_pawn}"
-            for opponent_pawn in opponent_pawns[captured_pawn.index:]:
-                # due to the pop, the indexes of all other pawns have been
-                opponent_pawn.index -= 1
-            if captured_pawn.style == SENSEI_STYLE:
-                del self.state.sensei_pawns[opponent]
-                assert self.state.sensei_pawns, "Both sensei pawns have been removed!"
-
-        pawn = self.state.board[position]
-        pawn.move(target)
+            new_state[PAWNS_INDEX + opponent] &= ~(1 << target)
+            if new_state[SENSEI_INDEX + opponent] == target:
+                new_state[SENSEI_INDEX + opponent] = CAPTURED
+
+        # the used card goes to the middle and the old middle card goes into the player's hand
+        hand = new_state[HAND_INDEX + player]
+        kept_card = hand[0] if hand[1] == card_index else hand[1]
+        middle_card = new_state[MIDDLE_CARD_INDEX]
+        if kept_card < middle_card:
+            new_state[HAND_INDEX + player] = (kept_card, middle_card)
+        else:
+            new_state[HAND_INDEX + player] = (middle_card, kept_card)
+        new_state[MIDDLE_CARD_INDEX] = card_index
 
+        self.undo_journal.append(self.state)
+        self.state = tuple(new_state)
         self.active_player = opponent
-        self._assert_pawns_in_board()
+
+        if CHECK_STATE:
+            self._assert_state()
+
+    def unmake_move(self):
+        '''Undo the last move made with make_move, restoring both the state and the active player.'''
+        self.state = self.undo_journal.pop()
+        self.active_player = Game.get_other_player(self.active_player)
 
     def who_won(self):
         '''Return 0 if player 0 won, 1 if player 1 won, -1 if there was a tie, and None if the game has not finished'''
-        if len(self.state.sensei_pawns) < 2:
-            # return the player who still has their sensei pawn
-            # see https://stackoverflow.com/a/46042617
-            return next(iter(self.state.sensei_pawns))
-
-        for player, arch_position in enumerate(ENEMY_ARCH_POSITIONS):
-            try:
-                arch_pawn = self.state.board[arch_position]
-                if arch_pawn.style == SENSEI_STYLE and arch_pawn.player == player:
-                    return player
-            except KeyError:
-                # there is no pawn in the arch position
-                pass
+        sensei0 = self.state[SENSEI_INDEX]
+        sensei1 = self.state[SENSEI_INDEX + 1]
+        # the player who still has their sensei pawn wins
+        if sensei0 == CAPTURED:
+            return 1
+        if sensei1 == CAPTURED:
+            return 0
+
+        # a sensei that reaches the enemy's arch wins
+        if sensei0 == ENEMY_ARCH_SQUARES[0]:
+            return 0
+        if sensei1 == ENEMY_ARCH_SQUARES[1]:
+            return 1
 
         return None
 
+    def get_pawn_string(self, square):
+        '''Return a string describing the pawn on a square'''
+        for player in PLAYERS:
+            if self.state[PAWNS_INDEX + player] & (1 << square):
+                if square == self.state[SENSEI_INDEX + player]:
+                    style = SENSEI_STYLE
+                else:
+                    style = STUDENT_STYLE
+                return f"Player {player}'s {style} pawn at {square_to_position(square)}"
+
     def move_to_string(self, move):
         card_index, position, target, capture = move
-        card = self.state.hands[self.active_player][card_index]
-        pawn = self.state.board[position]
-
-        if capture:
-            captured_pawn = self.state.board[target]
+        card = CARDS[card_index]
+        if position == self.state[SENSEI_INDEX + self.active_player]:
+            style = SENSEI_STYLE
+        else:
+            style = STUDENT_STYLE
 
-        if target in ENEMY_ARCH_POSITIONS:
-            arch_owner = Game.get_other_player(ENEMY_ARCH_POSITIONS.index(target))
-            target = f"Player {arch_owner}'s *arch at {target}"
+        if target in ENEMY_ARCH_SQUARES:
+            arch_owner = Game.get_other_player(ENEMY_ARCH_SQUARES.index(target))
+            target_string = f"Player {arch_owner}'s *arch at {square_to_position(target)}"
+        else:
+            target_string = str(square_to_position(target))
 
-        ans = f"{card.name} - moving {pawn.style} pawn at {position} to {target}"
+        ans = f"{card.name} - moving {style} pawn at {square_to_position(position)} to {target_string}"
         if capture:
-            ans += f" capturing {str(captured_pawn)[1:-1]}"
+            ans += f" capturing {self.get_pawn_string(target)}"
 
         return ans
 
@@ -364,7 +357,8 @@ class PawnCountingEvaluator(Evaluator):
         if winner is None:
             opponent = Game.get_other_player(player_number)
             # return the number of pawns that player has minus the number of pawns the oppponent has
-            return Evaluation(len(game.state.pawns[player_number]) - len(game.state.pawns[opponent]))
+            return Evaluation(bin(game.state[PAWNS_INDEX + player_number]).count("1") -
+                              bin(game.state[PAWNS_INDEX + opponent]).count("1"))
         else:
             if winner == player_number:
                 return Evaluation(self.win_loss_rewards[0])
@@ -374,27 +368,9 @@ class PawnCountingEvaluator(Evaluator):
 def move_to_string(move, game):
     return game.move_to_string(move)
 
-def board_to_string(board):
-    ans = "\n<Board:\n"
-    for pawn, position in board.items():
-        ans += f"{position}: {pawn}\n"
-    ans += ">"
-    return ans
-
 
 if __name__ == "__main__":
-    pass
-    # game = Onitama()
-    # # print(game)
-    # # for move in game.get_possible_moves():
-    # #     print(move_to_string(move))
-    #     # card_index, pawn, pawn_target, captured_pawn = move
-    #     # print(f"<Using {game.state.hands[game.active_player][card_index]} move {pawn} to {pawn_target} capturing {captured_pawn}>")
-    #     # # print(card_index, pawn, pawn_target, captured_pawn)
-    #
-    # copy = game.get_copy()
-    # for copy_pawns in copy.state.pawns.values():
-    #     for copy_pawn in copy_pawns:
-    #         print(copy_pawn)
-    #         assert copy_pawn not in game.state.pawns[0]
-    #         assert copy_pawn not in game.state.pawns[1]
+    game = Onitama()
+    print(game)
+    for move in game.get_possible_moves():
+        print(move_to_string(move, game))
@@ -0,0 +1,143 @@
+'''
+Opening books: the moves a strong (but slow) player picked for every position near the start of a game, saved ahead of time.
+
+The opening is where the board is the most open, so it's where search players take the longest,
+...but it's also where the same few positions come up in almost every game.
+A book is built offline by asking a player for its move in every position up to some number of moves into the game,
+...and then an OpeningBookPlayer answers from the book instantly and only searches once the game leaves it.
+
+Positions are keyed by their canonical hash (see Game.get_canonical_hash), so a position and its mirror image
+...share one entry, and books are saved as JSON in the form
+{"game": name, "plies": how many moves deep the book goes, "moves": {canonical hash: canonical move, ...}}
+'''
+import json
+import os
+import tempfile
+
+from players import Player
+
+
+class OpeningBook:
+    '''The moves for the positions in an opening book file (see the module docstring for the format)'''
+
+    def __init__(self, path, game_name=None):
+        '''game_name: the name of the game the book has to be for (None to load a book for any game)'''
+        with open(path) as f:
+            data = json.load(f)
+        self.game_name = data["game"]
+        if game_name is not None and self.game_name != game_name:
+            raise ValueError("{} is an opening book for {}, not {}".format(path, self.game_name, game_name))
+        self.plies = data["plies"]
+        # JSON keys are always strings
+        self.moves = {int(key): move for key, move in data["moves"].items()}
+
+    def get_move(self, game):
+        '''Return the book move for the game, or None if the position isn't in the book'''
+        game_hash, symmetry = game.get_canonical_hash()
+        move = self.moves.get(game_hash)
+        if move is None:
+            return None
+        return game.canonical_to_move(move, symmetry)
+
+    def __len__(self):
+        return len(self.moves)
+
+
+def write_opening_book(path, moves, game_name, plies):
+    '''Save moves (in the form {canonical hash: canonical move, ...}) to an opening book file at path
+    The file is written next to path and then moved into place, so a half-written book is never loaded.
+    '''
+    # each writer gets its own temporary file (see write_tablebase)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump({"game": game_name, "plies": plies, "moves": {str(key): move for key, move in moves.items()}}, f)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def get_player_move(player, game):
+    '''Return the move the player would make in the game, without changing the game'''
+    moved_game = game.get_copy()
+    player.make_move(moved_game)
+    moved_hash = moved_game.get_hash()
+    for move in game.get_possible_moves():
+        if game.get_moved_copy(move).get_hash() == moved_hash:
+            return move
+    raise ValueError("The player made a move that isn't possible")
+
+
+def build_opening_book(game, player, plies, moves=None, on_move=None, comment=1):
+    '''Returns a dictionary in the form {canonical hash: canonical move, ...} with the move the player makes
+    ...in every unfinished position up to plies moves from the game (and all of their symmetric versions)
+
+    moves: a dictionary of that form from an earlier build; positions already in it aren't asked about again
+    ...(so a long build can be stopped and picked up later)
+    on_move: called like on_move(moves) after each move is added (to save progress, for example)
+    comment: how verbose the print statements are
+    '''
+    if moves is None:
+        moves = {}
+    level = [game]
+    for ply in range(plies + 1):
+        next_level = {}
+        for position in level:
+            game_hash, symmetry = position.get_canonical_hash()
+            if game_hash not in moves:
+                move = get_player_move(player, position)
+                moves[game_hash] = position.move_to_canonical(move, symmetry)
+                if on_move is not None:
+                    on_move(moves)
+            if ply < plies:
+                for move in position.get_continue_moves():
+                    next_game = position.get_moved_copy(move)
+                    if next_game.who_won() is None:
+                        # only one of each set of symmetric positions needs to be looked at
+                        next_level.setdefault(next_game.get_canonical_hash()[0], next_game)
+        if comment > 0:
+            print("{} positions {} moves in ({} in the book)".format(len(level), ply, len(moves)))
+        level = list(next_level.values())
+    return moves
+
+
+class OpeningBookPlayer(Player):
+    '''A player that makes the book move when the position is in its opening book and lets another player move otherwise'''
+
+    def __init__(self, book, fallback):
+        '''
+        book: an OpeningBook
+        fallback: the player that makes the moves in positions that aren't in the book
+        '''
+        self.book = book
+        self.fallback = fallback
+
+    def make_move(self, game):
+        move = self.book.get_move(game)
+        if move is None:
+            self.fallback.make_move(game)
+            self.last_stats = self.fallback.last_stats
+        else:
+            game.make_move(move)
+            self.last_stats = None
+
+    def __str__(self):
+        return "<OpeningBookPlayer object with fallback {}>".format(self.fallback)
+
+
+if __name__ == "__main__":
+    # build (or finish building) the book the website's connect4 bot uses
+    # every position up to 4 moves in is about 700 positions, so this takes a couple of hours
+    from connect_four import ConnectFour
+    from advised_monte_carlo_player import AdvisedMonteCarloPlayer
+
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "connect_four_book.json")
+    plies = 4
+    moves = None
+    if os.path.exists(path):
+        moves = OpeningBook(path, "connect-four").moves
+    # the book player gets far more time than the website's bot has
+    player = AdvisedMonteCarloPlayer(7, 2, 2, time_limit=10)
+    build_opening_book(ConnectFour(), player, plies, moves,
+                       on_move=lambda moves: write_opening_book(path, moves, "connect-four", plies))
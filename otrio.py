@@ -1,100 +1,175 @@
 from game import Game
+from mnk_tables import get_symmetries, get_inverse
 
-SKIP_MOVE = [-1, -1]
+SKIP_MOVE = (-1, -1)
 SKIP_MOVES = [SKIP_MOVE]
 
-class Slot:
-    def __init__(self, slots=None):
-        if slots is None:
-            slots = [None, None, None]
-        # small, medium, big
-        self.slots = slots
+# the board is 9 slots (numbered like tic-tac-toe) that each hold a small, medium, and big piece
+# each of those 27 cells gets a bit: the cell for a slot and a size is slot * 3 + size
+SIZES = (0, 1, 2)
+FULL_MASK = (1 << 27) - 1
+# the blocker piece put in the middle slot at the start of the game
+BLOCKER_MASK = 1 << (4 * 3 + 1)
+# all of the cells of each size, indexed by size
+SIZE_MASKS = tuple(sum(1 << (slot * 3 + size) for slot in range(9)) for size in SIZES)
+# 3 pieces of each size, with 2 bits per size
+START_PIECES = sum(3 << (size * 2) for size in SIZES)
 
-    def swap_players(self):
-        for slot_index, slot in enumerate(self.slots):
-            if slot is not None:
-                self.slots[slot_index] = Game.get_other_player(slot)
+# the 8 rotations and reflections of the slots (the blocker in the middle never moves), and the symmetries that undo them
+SLOT_SYMMETRIES = get_symmetries(3, 3)
+INVERSE_SLOT_SYMMETRIES = [get_inverse(symmetry) for symmetry in SLOT_SYMMETRIES]
 
-    def get_copy(self):
-        return Slot(self.slots[:])
+# the indexes of the different parts of the state (see Otrio.get_initial_state)
+MASK_INDEX = 0
+PIECES_INDEX = 2
+WINNER_INDEX = 4
 
-    def get_possible_moves(self):
-        ans = []
-        for slot_index, slot in enumerate(self.slots):
-            if slot is None:
-                ans.append(slot_index)
-        return ans
 
-    def make_move(self, move, player):
-        self.slots[move] = player
+def get_win_lines():
+    '''Return a tuple of the masks of every set of three cells that wins the game'''
+    ans = []
+    # all three sizes in a single slot
+    for slot in range(9):
+        ans.append(sum(1 << (slot * 3 + size) for size in SIZES))
+    # rows, columns, and diagonals of slots
+    for first, middle, last in [(0, 1, 2), (3, 4, 5), (6, 7, 8), (0, 3, 6), (1, 4, 7), (2, 5, 8), (0, 4, 8), (2, 4, 6)]:
+        # the same size in each slot, and ascending and descending sizes
+        for sizes in [(0, 0, 0), (1, 1, 1), (2, 2, 2), (0, 1, 2), (2, 1, 0)]:
+            ans.append(sum(1 << (slot * 3 + size) for slot, size in zip((first, middle, last), sizes)))
+    return tuple(ans)
 
-    def check_slot(self, number):
-        return self.slots[number]
 
-    def __str__(self):
-        return str(self.slots)
+WIN_LINES = get_win_lines()
+# the winning lines that go through each cell, indexed by cell
+CELL_WIN_LINES = tuple(tuple(line for line in WIN_LINES if line & (1 << cell)) for cell in range(27))
+
+
+def get_piece_count(pieces, size):
+    '''Return how many pieces of the given size are left in a packed count of pieces'''
+    return (pieces >> (size * 2)) & 3
+
+
+def can_move(pieces, free_cells):
+    '''Return whether or not a player with the packed count of pieces can move in any of the free cells'''
+    for size in SIZES:
+        if get_piece_count(pieces, size) and free_cells & SIZE_MASKS[size]:
+            return True
+    return False
+
 
 class Otrio(Game):
+    can_undo = True
+
     def __str__(self):
-        def slot_str(slot):
-            '''Returns a string that is three digits. Relies on the fact that players are numbers.
-            0 is empty, 1 is player 0, and 2 is player 1'''
+        mask0, mask1 = self.state[MASK_INDEX], self.state[MASK_INDEX + 1]
+
+        def slot_str(slot_index):
+            '''Returns a string that is three digits.
+            0 is empty, 1 is player 0, 2 is player 1, and 3 is the blocker'''
             ans = ""
-            for slot_index in [0, 1, 2]:
-                slot_value = slot.check_slot(slot_index)
-                if slot_value is None:
-                    ans += "0"
+            for size in SIZES:
+                bit = 1 << (slot_index * 3 + size)
+                if mask0 & bit:
+                    ans += "1"
+                elif mask1 & bit:
+                    ans += "2"
+                elif BLOCKER_MASK & bit:
+                    ans += "3"
                 else:
-                    ans += str(int(slot_value) + 1)
+                    ans += "0"
             return ans
 
+        pieces = [[get_piece_count(self.state[PIECES_INDEX + player], size) for size in SIZES] for player in (0, 1)]
         ans = ""
-        ans += f"Pieces left:{self.state[0]}\n"
+        ans += f"Pieces left:{pieces}\n"
         line = "-" * 11  + "\n"
         ans += line
-        for slot_index, slot in enumerate(self.state[1]):
-            ans += slot_str(slot) + " "
+        for slot_index in range(9):
+            ans += slot_str(slot_index) + " "
             if slot_index % 3 == 2:
                 ans += "\n"
         ans += line
         return ans[:-1] # cutoff the last newline
 
     def get_initial_state(self):
-        '''Return the initial state of the game.
-        The state can be anything (object, string, number, etc.).
+        '''The state is a tuple in the form (player 0's mask, player 1's mask, player 0's pieces, player 1's pieces, winner)
+
+        Each mask has a bit set for every cell the player has a piece in.
+        The pieces are how many pieces of each size the player has left, packed into 2 bits per size.
+        The winner is kept up to date by make_move and is whatever who_won should return.
+        The state is never changed, only replaced, so copies can share it.
         '''
-        # how many pieces left of each size for each player
-        pieces = [[3, 3, 3], [3, 3, 3]]
-        board = []
-        for slot_index in range(9):
-            board.append(Slot())
-        board[4].make_move(1, 2) # put the blocker in the middle
-        return (pieces, board)
+        return (0, 0, START_PIECES, START_PIECES, None)
 
     def get_state_hash(self):
-        '''Return a unique string for the state'''
-        return str([str(slot) for slot in self.state[1]])
+        '''Return a unique integer for the state'''
+        # the pieces left and the winner can be worked out from the board
+        return self.state[MASK_INDEX] | self.state[MASK_INDEX + 1] << 27
+
+    def get_swapped_state_hash(self):
+        '''Return the state hash the game would have after swap_players'''
+        return self.state[MASK_INDEX + 1] | self.state[MASK_INDEX] << 27
+
+    def get_canonical_hash(self):
+        '''Return a tuple in the form (canonical hash, index of the symmetry)'''
+        key = self.get_hash()
+        # the hash is 18 groups of 3 bits: the pieces in each slot for one player and then the other
+        slot_groups = [(key >> (group * 3)) & 7 for group in range(18)]
+        # the canonical board is whichever rotation or reflection has the smallest hash
+        ans = None
+        for symmetry_index, symmetry in enumerate(SLOT_SYMMETRIES):
+            symmetric_key = 0
+            for slot_index, original_slot_index in enumerate(symmetry):
+                symmetric_key |= (slot_groups[original_slot_index] << (slot_index * 3) |
+                                  slot_groups[original_slot_index + 9] << (slot_index * 3 + 27))
+            if ans is None or symmetric_key < ans[0]:
+                ans = (symmetric_key, symmetry_index)
+        return ans
+
+    def move_to_canonical(self, move, symmetry):
+        slot_index, size = move
+        if slot_index == SKIP_MOVE[0]:
+            return SKIP_MOVE
+        return (INVERSE_SLOT_SYMMETRIES[symmetry][slot_index], size)
+
+    def canonical_to_move(self, move, symmetry):
+        slot_index, size = move
+        if slot_index == SKIP_MOVE[0]:
+            return SKIP_MOVE
+        return (SLOT_SYMMETRIES[symmetry][slot_index], size)
+
+    @classmethod
+    def get_swapped_state(cls, state):
+        '''Return the state with the players swapped'''
+        mask0, mask1, pieces0, pieces1, winner = state
+        if winner is not None and winner >= 0:
+            winner = Game.get_other_player(winner)
+        return (mask1, mask0, pieces1, pieces0, winner)
 
     def swap_players(self):
         '''Swap the players in a game; returns nothing'''
-        for slot in self.state[1]:
-            slot.swap_players()
-        self.state[0][0], self.state[0][1] = self.state[0][1], self.state[0][0]
+        self.state = self.get_swapped_state(self.state)
+        # swap the remembered states too so that moves can still be unmade
+        self.undo_journal = [self.get_swapped_state(state) for state in self.undo_journal]
 
     def get_copy(self):
         '''Return a copy of the object'''
-        return Otrio((([pieces[:] for pieces in self.state[0]], [slot.get_copy() for slot in self.state[1]]), self.active_player))
+        # the state is never changed in place, so it can be shared
+        return Otrio((self.state, self.active_player))
 
     def get_possible_moves(self):
         '''Return a list of the possible moves that can be taken by the active player in the current state.
         Behavior is undefined when the game is complete.
-        A single move can be anything (object, string, number, etc.).
+        A move is a tuple in the form (slot index, piece size)
         '''
+        free_cells = FULL_MASK & ~(self.state[MASK_INDEX] | self.state[MASK_INDEX + 1] | BLOCKER_MASK)
+        pieces = self.state[PIECES_INDEX + self.active_player]
+        sizes = [size for size in SIZES if get_piece_count(pieces, size)]
         ans = []
-        for slot_index, slot in enumerate(self.state[1]):
-            for open_slot in slot.get_possible_moves():
-                if self.state[0][self.active_player][open_slot] > 0:
-                    ans.append([slot_index, open_slot])
+        for slot_index in range(9):
+            for size in sizes:
+                if free_cells & (1 << (slot_index * 3 + size)):
+                    ans.append((slot_index, size))
         if not ans:
             # there are no moves available, so you can skip your turn
             ans = SKIP_MOVES
@@ -104,86 +179,50 @@ class Otrio(Game):
         '''Change the state of the game and update the active player based on the action.
         Assumes the action is valid. Behavior is undefined if action is not valid.
         '''
-        slot_index, slot_move = action
+        slot_index, size = action
+        player = self.active_player
+        new_state = list(self.state)
         # if it's not a skip move
-        if action != SKIP_MOVE:
-            self.state[1][slot_index].make_move(slot_move, self.active_player)
-            self.state[0][self.active_player][slot_move] -= 1
+        if slot_index != SKIP_MOVE[0]:
+            cell = slot_index * 3 + size
+            mask = new_state[MASK_INDEX + player] | (1 << cell)
+            new_state[MASK_INDEX + player] = mask
+            new_state[PIECES_INDEX + player] -= 1 << (size * 2)
+            # only the lines through the new piece could have been completed
+            for line in CELL_WIN_LINES[cell]:
+                if mask & line == line:
+                    new_state[WINNER_INDEX] = player
+                    break
+            if new_state[WINNER_INDEX] is None:
+                free_cells = FULL_MASK & ~(new_state[MASK_INDEX] | new_state[MASK_INDEX + 1] | BLOCKER_MASK)
+                if not (can_move(new_state[PIECES_INDEX], free_cells) or
+                        can_move(new_state[PIECES_INDEX + 1], free_cells)):
+                    # Nobody can move - it's a tie
+                    new_state[WINNER_INDEX] = -1
+
+        self.undo_journal.append(self.state)
+        self.state = tuple(new_state)
+        self.active_player = Game.get_other_player(player)
+
+    def unmake_move(self):
+        '''Undo the last move made with make_move, restoring both the state and the active player.'''
+        self.state = self.undo_journal.pop()
         self.active_player = Game.get_other_player(self.active_player)
 
     def who_won(self):
         '''Return 0 if player 0 won, 1 if player 1 won, -1 if there was a tie, and None if the game has not finished'''
-        pieces, board = self.state
-        # Detect single-slot wins
-        for slot in board:
-            inner_slot0 = slot.check_slot(0)
-            inner_slot1 = slot.check_slot(1)
-            inner_slot2 = slot.check_slot(2)
-
-            if inner_slot0 is not None and inner_slot0 == inner_slot1 and inner_slot1 == inner_slot2:
-                return inner_slot0
-
-        def get_next_right(num):
-            return num + 1
-
-        def get_next_left(num):
-            return num - 1
-
-        def get_next_down(num):
-            return num + 3
-
-        def get_next_down_left(num):
-            return get_next_left(get_next_down(num))
-
-        def get_next_down_right(num):
-            return get_next_right(get_next_down(num))
-
-        for starting_pieces, get_next in [([0, 1, 2], get_next_down), ([0, 3, 6], get_next_right), ([0], get_next_down_right), ([2], get_next_down_left)]:
-            # check for non-single-slot wins
-            for slot_index in starting_pieces:
-                first_slot_index = slot_index
-                middle_slot_index = get_next(slot_index)
-                last_slot_index = get_next(middle_slot_index)
-
-                # check for ascending and descending wins
-                # see if middle is taken - you can't have an ascending or descending win unless you have the middle of the middle
-                possible_winner = board[middle_slot_index].check_slot(1)
-                if possible_winner is not None:
-                    # check for ascending and descending wins
-                    for index1, index2 in [[0, 2], [2, 0]]:
-                        if board[first_slot_index].check_slot(index1) == possible_winner and board[last_slot_index].check_slot(index2) == possible_winner:
-                            return possible_winner
-
-                # check for same-piece wins
-                for piece_size in [0, 1, 2]:
-                    possible_winner = board[first_slot_index].check_slot(piece_size)
-                    if possible_winner is not None and board[middle_slot_index].check_slot(piece_size) == possible_winner and board[last_slot_index].check_slot(piece_size) == possible_winner:
-                        return possible_winner
-
-        # check for a tie
-        possible_moves = self.get_possible_moves()
-        if possible_moves == SKIP_MOVES:
-            self.active_player = Game.get_other_player(self.active_player)
-            # see if the other player has any moves they can make
-            possible_moves = self.get_possible_moves()
-            # switch the player back to normal
-            self.active_player = Game.get_other_player(self.active_player)
-            if possible_moves == SKIP_MOVES:
-                # Nobody can move - it's a tie
-                return -1
-
-        return None
+        return self.state[WINNER_INDEX]
 
 if __name__ == "__main__":
     minigame = Otrio()
     print(minigame.get_possible_moves()[:10])
     print(minigame)
-    minigame.make_move([0, 0])
-    minigame.make_move([1, 0])
-    minigame.make_move([3, 0])
-    minigame.make_move([1, 1])
-    minigame.make_move([6, 0])
-    minigame.make_move([1, 2])
+    minigame.make_move((0, 0))
+    minigame.make_move((1, 0))
+    minigame.make_move((3, 0))
+    minigame.make_move((1, 1))
+    minigame.make_move((6, 0))
+    minigame.make_move((1, 2))
     print(minigame)
     print(minigame.get_possible_moves())
     print(minigame.who_won())
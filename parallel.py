@@ -0,0 +1,40 @@
+'''
+Helpers for spreading the evaluation of each possible move across a ProcessPoolExecutor.
+
+Each move is evaluated in its own task, which gets a copy of the game (copies don't carry the undo journal,
+...so they're cheap to send to another process) and its own random seed.
+The seeds come from the random module of the process giving out the tasks, so the simulations in different
+...tasks are independent of each other, and seeding that process makes the results repeatable.
+
+The executor has to run the tasks in other processes. Each task seeds the random module of the process it runs in
+...(the evaluations use the random module through RandomPlayer and so on), which threads would all share.
+'''
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+
+def run_move_task(function, game, move, seed, args, kwargs):
+    '''Make the move in the game and return function(game, *args, **kwargs) with the random module seeded
+    This is what runs in the executor, so it has to be a module-level function (so that it can be pickled)
+    '''
+    random.seed(seed)
+    game.make_move(move)
+    return function(game, *args, **kwargs)
+
+
+def submit_moves(executor, function, game, moves, *args, **kwargs):
+    '''Start a task in the executor for each move that returns function(game after the move, *args, **kwargs)
+    Returns a list of the futures for the tasks, in the same order as the moves.
+    The function and its arguments are sent to other processes, so they can't be lambdas or other unpicklable things.
+    Raises ValueError if the executor isn't a ProcessPoolExecutor (see the module docstring).
+    '''
+    if not isinstance(executor, ProcessPoolExecutor):
+        raise ValueError("The moves can only be evaluated in a ProcessPoolExecutor, not {}".format(executor))
+    # every task gets its own copy of the game, since each one makes its move in the game it's given
+    return [executor.submit(run_move_task, function, game.get_copy(), move, random.getrandbits(64), args, kwargs)
+            for move in moves]
+
+
+def map_moves(executor, function, game, moves, *args, **kwargs):
+    '''Returns a list of function(game after the move, *args, **kwargs) for each move, computed in the executor'''
+    return [future.result() for future in submit_moves(executor, function, game, moves, *args, **kwargs)]
@@ -2,15 +2,116 @@
 Written by London Lowmanstone
 Based on code I wrote in high school.
 '''
+import math
 import random
+from statistics import NormalDist
 import useful_functions as useful
 
 
+def get_score_stats(results):
+    '''Returns (games, average score, variance of the score) for player 0 given results in the form [wins, losses, ties]
+    where a win scores 1, a loss scores 0, and a tie scores .5
+    '''
+    wins, losses, ties = results
+    games = wins + losses + ties
+    mean = (wins + .5 * ties) / games
+    variance = (wins + .25 * ties) / games - mean ** 2
+    return games, mean, variance
+
+
+def get_confidence_bounds(results, error_level):
+    '''Returns (low, high) bounds on player 0's expected score (see get_score_stats) that hold with 1 - error_level confidence
+    This uses the normal approximation, so it's only accurate after a decent number of games.
+    '''
+    games, mean, variance = get_score_stats(results)
+    half_width = NormalDist().inv_cdf(1 - error_level / 2) * math.sqrt(variance / games)
+    return max(0, mean - half_width), min(1, mean + half_width)
+
+
+def get_log_likelihood_ratio(results, low, high):
+    '''Returns the log likelihood ratio of player 0's expected score being high instead of low, given the results so far
+    It uses the normal approximation for game scores (like a generalized SPRT does),
+    ...which handles ties without having to know how likely they are ahead of time.
+    Returns None if every game had the same result so far, since then there's nothing to approximate with yet.
+    '''
+    games, mean, variance = get_score_stats(results)
+    if variance == 0:
+        return None
+    return games * (high - low) * (2 * mean - low - high) / (2 * variance)
+
+
+def sprt_decision(results, error_level, margin):
+    '''Returns which player a sequential probability ratio test decided is better (0 or 1),
+    -1 if it decided that they're even (their expected scores are within margin of .5), or None if it isn't settled yet
+
+    There are two tests: one of player 0's expected score being .5 against it being .5 + margin,
+    ...and one of it being .5 against it being .5 - margin. A player is better once their test rules out .5,
+    ...and the players are even once both tests rule out the player being better.
+    Each test picks wrong about error_level of the time, so even players are called uneven about twice that often.
+    '''
+    accept_better = math.log((1 - error_level) / error_level)
+    accept_even = math.log(error_level / (1 - error_level))
+    player_0_ratio = get_log_likelihood_ratio(results, .5, .5 + margin)
+    if player_0_ratio is None:
+        return None
+    player_1_ratio = get_log_likelihood_ratio(results, .5, .5 - margin)
+    if player_0_ratio >= accept_better:
+        return 0
+    if player_1_ratio >= accept_better:
+        return 1
+    if player_0_ratio <= accept_even and player_1_ratio <= accept_even:
+        return -1
+    return None
+
+
+def play_test_game(players, start_game, randomize_first_player=True, is_initial_state=True, comment=2, seed=None):
+    '''Plays one game between the players for test_against and returns the winner (-1 for a tie)
+    The game starts from the start_game (see test_against for the other parameters).
+    seed: if given, the random module is seeded with it first, so that the game can be played again exactly
+    This is what runs in the executor when test_against is given one, so it has to be a module-level function.
+    '''
+    if seed is not None:
+        random.seed(seed)
+
+    # set up the game from the start_game
+    if randomize_first_player:
+        # randomize who goes first
+        if is_initial_state:
+            # no need to swap the players; no one has moved yet
+            game = start_game.get_copy()
+            if random.choice([True, False]):
+                game.active_player = 0
+            else:
+                game.active_player = 1
+        else:
+            # we need to swap the players if a different one is going to go first
+            if random.choice([True, False]):
+                game = start_game.get_copy()
+            else:
+                game = start_game.get_swapped_copy()
+    else:
+        # not randomizing the first player, so we can just copy the starting game
+        game = start_game.get_copy()
+
+    while game.who_won() is None:
+        players[game.active_player].make_move(game)
+        if comment > 5:
+            print(game)
+
+    if comment > 4:
+        print(game)
+    return game.who_won()
+
+
 def test_against(players, start_game, game_parameters=None, rounds=50, games_per_round=1000,
-                 randomize_first_player=True, is_initial_state=True, comment=2, pct_increment=2):
+                 randomize_first_player=True, is_initial_state=True, comment=2, pct_increment=2,
+                 error_level=None, margin=.05, min_games=20,
+                 executor=None):
     '''Returns a tuple of lists in the form (highs, lows, ranges, averages) with stats for player 0's performance against player 1
     Each list is in the form [wins, losses, ties], and the names are pretty self-explanatory.
     For example, highs is a list of the most amount of wins, losses, and ties it achieved across any round.
+    With an error_level, the tuple is (highs, lows, ranges, averages, games played, (low bound, high bound))
+    ...where the bounds are the confidence bounds on player 0's expected score (1 for a win, 0 for a loss, .5 for a tie)
 
     players: a tuple in the form (player 0, player 1) where both are Player objects
     start_game: an instance of a Game (or Game subclass) that the players should start at for each game they play
@@ -20,6 +121,19 @@ def test_against(players, start_game, game_parameters=None, rounds=50, games_per
     is_initial_state: whether or not the start_game is in its initial state (if False, randomizing the first player may take longer)
     comment: how verbose the print statements are; higher integers give more print statements
     pct_increment: how much the percentage should increase by when it prints out
+    error_level: if given, the players stop playing as soon as a sequential test (see sprt_decision) decides which player
+    ...is better (or that they're even) with about this chance of being wrong, instead of always playing every round
+    ...(the games of the round that was being played when it stopped count towards the averages and the games played,
+    ...but not towards the highs, lows and ranges, which are None if it stopped during the first round)
+    margin: how far from an even score (.5) a player has to be to count as better for the sequential test
+    ...(the smaller it is, the more games it takes to decide that the players are even)
+    min_games: how many games have to be played before the sequential test can stop the players
+    executor: an Executor (like a concurrent.futures.ProcessPoolExecutor) to play the games of each round at the same time in
+    ...(None to play them one at a time). Either way, each game gets its own random seed, and the seeds all come from
+    ...one number drawn from this process's random module, so seeding it makes the whole match repeatable
+    ...and the same whether or not the games are spread out.
+    The players and start_game are sent to other processes for every game, so they have to be picklable
+    ...(players that hold an executor themselves can't be), and each game starts with the players as they were passed in.
     '''
 
 
@@ -27,66 +141,95 @@ def test_against(players, start_game, game_parameters=None, rounds=50, games_per
     lows = [games_per_round + 1] * 3
     highs = [-1] * 3
     overall = [0] * 3
-    for i in range(rounds):
-        results = [0] * 3  # [wins, losses, ties] for the player
-        for game_num in range(games_per_round):
-            if comment > 3:
-                print("Testing game {}/{}".format((game_num + 1), games_per_round))
-
-            # set up the game from the start_game
-            if randomize_first_player:
-                # randomize who goes first
-                if is_initial_state:
-                    # no need to swap the players; no one has moved yet
-                    game = start_game.get_copy()
-                    if random.choice([True, False]):
-                        game.active_player = 0
-                    else:
-                        game.active_player = 1
+    full_rounds = 0
+    decided = None
+    # the games seed this process's random module when they're played here, so the seeds come from their own generator
+    # ...which draws them in the same order whether or not the games are played here
+    seeds = random.Random(random.getrandbits(64))
+    # put the random module back afterwards so that playing the games here doesn't change what it gives the caller
+    random_state = random.getstate()
+    try:
+        for i in range(rounds):
+            results = [0] * 3  # [wins, losses, ties] for the player
+            game_seeds = [seeds.getrandbits(64) for game_num in range(games_per_round)]
+            if executor is not None:
+                # start every game in the round
+                futures = [executor.submit(play_test_game, players, start_game, randomize_first_player,
+                                           is_initial_state, comment, game_seed)
+                           for game_seed in game_seeds]
+            for game_num in range(games_per_round):
+                if executor is not None:
+                    winner = futures[game_num].result()
                 else:
-                    # we need to swap the players if a different one is going to go first
-                    if random.choice([True, False]):
-                        game = start_game.get_copy()
-                    else:
-                        game = start_game.get_swapped_copy()
-            else:
-                # not randomizing the first player, so we can just copy the starting game
-                game = start_game.get_copy()
+                    if comment > 3:
+                        print("Testing game {}/{}".format((game_num + 1), games_per_round))
+                    winner = play_test_game(players, start_game, randomize_first_player, is_initial_state, comment,
+                                            game_seeds[game_num])
 
-            while game.who_won() is None:
-                players[game.active_player].make_move(game)
-                if comment > 5:
-                    print(game)
+                # update the results; this works because player 0 is always the player we care about
+                results[winner] += 1
+                if comment > 3:
+                    print("Results so far in round:\n{}".format(results))
 
-            # update the results; this works because player 0 is always the player we care about
-            results[game.who_won()] += 1
-            if comment > 3:
-                if comment > 4:
-                    print(game)
-                print("Results so far in round:\n{}".format(results))
+                if error_level is not None:
+                    all_results = [overall[j] + results[j] for j in range(3)]
+                    if sum(all_results) >= min_games:
+                        decided = sprt_decision(all_results, error_level, margin)
+                        if decided is not None:
+                            if executor is not None:
+                                for future in futures[game_num + 1:]:
+                                    future.cancel()
+                            break
 
-        if comment > 2:
-            print("Results of one round:\n{}".format(results))
+            if comment > 2:
+                print("Results of one round:\n{}".format(results))
 
-        if pct_increment > 0 and comment > 1:
-            useful.print_percent(i, rounds, increment_amt=pct_increment, round_amt=i)
+            if pct_increment > 0 and comment > 1:
+                useful.print_percent(i, rounds, increment_amt=pct_increment, round_amt=i)
 
-        # update the lists
-        for j, testVal in enumerate(results):
-            lows[j] = min(lows[j], testVal)
-            highs[j] = max(highs[j], testVal)
-            overall[j] += testVal
+            # update the lists
+            # a round that was stopped early has fewer games, so it can't be compared with the others
+            round_finished = sum(results) == games_per_round
+            for j, testVal in enumerate(results):
+                if round_finished:
+                    lows[j] = min(lows[j], testVal)
+                    highs[j] = max(highs[j], testVal)
+                overall[j] += testVal
+            if round_finished:
+                full_rounds += 1
+
+            if decided is not None:
+                if comment > 1:
+                    if decided == -1:
+                        print("The players are even; stopping early")
+                    else:
+                        print("Player {} is better; stopping early".format(decided))
+                break
+    finally:
+        random.setstate(random_state)
 
     # compute the other stats lists
-    ranges = [highs[i] - lows[i] for i in range(3)]
-    avgs = [overall[i] / rounds for i in range(3)]
+    games_played = sum(overall)
+    if full_rounds > 0:
+        ranges = [highs[i] - lows[i] for i in range(3)]
+    else:
+        highs = lows = ranges = None
+    # the averages are per round, but they're worked out per game so that the games of a shortened round count too
+    avgs = [overall[i] * games_per_round / games_played for i in range(3)]
 
     if comment > 0:
         print("Highs: {}".format(highs))
         print("Lows: {}".format(lows))
         print("Ranges: {}".format(ranges))
         print("Averages: {}".format(avgs))
-    return (highs, lows, ranges, avgs)
+    if error_level is None:
+        return (highs, lows, ranges, avgs)
+
+    bounds = get_confidence_bounds(overall, error_level)
+    if comment > 0:
+        print("Games played: {}".format(games_played))
+        print("Score bounds: {}".format(bounds))
+    return (highs, lows, ranges, avgs, games_played, bounds)
 
 
 if __name__ == "__main__":
@@ -104,6 +247,10 @@ if __name__ == "__main__":
 
     # significant: 71 - 6 - 2 (Mainly lost when it had a perfect trap set up that was blocked by an opponent, then it gave up easy wins; should be fixed with minimax)
     # test_against((BasicMonteCarloPlayer(5, 3), BasicMonteCarloPlayer(30)), ConnectFour, 1, 100, comment=6)
+
+    # small but real: 59 - 40 - 1 with the same total simulations (7 moves * 100) split by successive halving
+    # at half the simulations it's worse: 39 - 60 - 1
+    # test_against((BasicMonteCarloPlayer(total_simulations=700), BasicMonteCarloPlayer(100)), ConnectFour(), 1, 100, comment=4)
     '''
     from tic_tac_toe import TicTacToe
     from connect_four import ConnectFour
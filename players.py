@@ -1,11 +1,25 @@
 import random
 
+from search_stats import SearchStats
+
 
 class Player:
+    # set collect_stats to True (on a player or a player class) to have players that count the work they do
+    # ...put a SearchStats for each move they make in last_stats (see the search_stats module)
+    collect_stats = False
+    last_stats = None
+
     def make_move(self, game):
         '''Make a move in the game (a Game object)'''
         raise NotImplementedError
 
+    def get_new_stats(self):
+        '''Return a new SearchStats for the next move (and keep it in last_stats) if collect_stats is True, or None'''
+        if not self.collect_stats:
+            return None
+        self.last_stats = SearchStats()
+        return self.last_stats
+
     def __str__(self):
         return "<Player object>"
 
@@ -1,3 +1,5 @@
+from collections import OrderedDict
+
 from evaluation import Evaluation
 
 
@@ -57,13 +59,79 @@ class PositionEvaluation(Evaluation):
         return "<PositionEvaluation object with results: {}>".format(self.results)
 
 
-def position_eval(game, player_number, depth, rewards=(2, -2, 1.5, 0, 0)):
+class PositionEvalCache:
+    '''A memo table for position_eval that holds at most max_size positions
+
+    self.table is in the form {(game hash, whether the player is the active player): (depth, results), ...}
+    Results found by looking deeper are still right when looking less deep (they just know more),
+    ...so a position is only evaluated again when it's asked about more deeply than before.
+    When the table is full, the positions that were added first are forgotten first.
+    '''
+
+    def __init__(self, max_size=100000):
+        self.max_size = max_size
+        self.table = OrderedDict()
+
+    def get(self, game, player_number, depth):
+        '''Return the results for the game from at least `depth` moves deep, or None if they aren't in the table'''
+        entry = self.table.get((game.get_hash(), game.active_player == player_number))
+        if entry is not None:
+            entry_depth, results = entry
+            # -1 (or any negative depth) means the entire game was evaluated, which is as deep as it gets
+            if entry_depth < 0 or (depth >= 0 and entry_depth >= depth):
+                return results
+        return None
+
+    def get_proven_winner(self, game, player_number):
+        '''Return who wins the game with the best play (-1 for a tie) if the table has proof of it, and None otherwise'''
+        entry = self.table.get((game.get_hash(), game.active_player == player_number))
+        if entry is None:
+            return None
+        results = entry[1]
+        if 0 in results:
+            return player_number
+        if 1 in results:
+            return 1 - player_number
+        if 2 in results and 3 in results:
+            # each player can hold the other to a tie
+            return -1
+        return None
+
+    def add(self, game, player_number, depth, results):
+        '''Remember the results for the game from `depth` moves deep'''
+        key = (game.get_hash(), game.active_player == player_number)
+        table = self.table
+        if key in table:
+            del table[key]
+        elif len(table) >= self.max_size:
+            table.popitem(last=False)
+        table[key] = (depth, results)
+
+
+def position_eval(game, player_number, depth, rewards=(2, -2, 1.5, 0, 0), budget=None, cache=None, stats=None):
     '''Returns a PositionEvaluation object that stores if the game position is a certain win, loss, or tie for the player
     The game is analyzed `depth` moves out from the given state.
     If `depth` is -1, it will evaluate the entire game.
 
     The parameter `rewards` is merely passed on to the PositionEvaluation object this function returns
+    budget is a Budget that each position evaluated is spent from (see the budget module)
+    ...if it runs out, BudgetExhausted is raised and moves made in games that can undo are left for the caller to undo
+    cache is a PositionEvalCache to look positions up in and add them to
+    ...so positions reached through different orders of moves (and in later calls) are only evaluated once
+    stats is a SearchStats that the work is counted in (see the search_stats module)
     '''
+    if budget is not None:
+        budget.spend()
+    if cache is not None and depth != 0:
+        results = cache.get(game, player_number, depth)
+        if results is not None:
+            if stats is not None:
+                stats.cache_hits += 1
+            return PositionEvaluation(results, player_number, rewards)
+    if stats is not None:
+        stats.nodes += 1
+        stats.who_won_calls += 1
+
 
     def any_one(evaluations, value):
         '''Returns whether or not any one of the evaluations has the given value in its results'''
@@ -81,14 +149,16 @@ def position_eval(game, player_number, depth, rewards=(2, -2, 1.5, 0, 0)):
 
     # see the form of results in the PositionEvaluation class
     results = set()
-    if depth == 0:
-        winner = game.who_won()
+    winner = game.who_won()
+    if depth == 0 or winner is not None:
+        # finished games are scored the same no matter how deep the search was supposed to go
+        # (going down further would make every result true for the player to move, since there are no moves to check)
         # undetermined games don't fit in any category
         if winner is not None:
             if winner == -1:
                 # this could be either a force tie or forced tie, so add both
+                results.add(2)
                 results.add(3)
-                results.add(4)
             elif winner == player_number:
                 # win
                 results.add(0)
@@ -97,8 +167,17 @@ def position_eval(game, player_number, depth, rewards=(2, -2, 1.5, 0, 0)):
                 results.add(1)
     else:
         # compute the position evaluation for each of the lower games
-        lower_level = [position_eval(lower_game, player_number, depth - 1, rewards)
-                       for lower_game in game.get_next_level()]
+        # the moves are made in place (or in copies for games that can't undo)
+        lower_level = []
+        moves = game.get_possible_moves()
+        if stats is not None and not game.can_undo:
+            stats.copies += len(moves)
+        # evaluating the entire game (-1) keeps going to the end, so the depth stays -1 all the way down
+        lower_depth = depth - 1 if depth > 0 else depth
+        for move in moves:
+            lower_game = game.make_search_move(move)
+            lower_level.append(position_eval(lower_game, player_number, lower_depth, rewards, budget, cache, stats))
+            game.unmake_search_move(lower_game)
         # set up faster functions to work with our lower_level variable
         any_or_all = [lambda v: any_one(lower_level, v), lambda v: all_ones(lower_level, v)]
         if game.active_player != player_number:
@@ -116,11 +195,13 @@ def position_eval(game, player_number, depth, rewards=(2, -2, 1.5, 0, 0)):
         if any_or_all[1](1):
             results.add(1)
         # if any future positions are force ties, this position is a force tie
-        if any_or_all[0](3):
-            results.add(3)
+        if any_or_all[0](2):
+            results.add(2)
         # if all future positions are forced ties, this position is a forced tie
-        if any_or_all[1](4):
-            results.add(4)
+        if any_or_all[1](3):
+            results.add(3)
+        if cache is not None:
+            cache.add(game, player_number, depth, frozenset(results))
 
     return PositionEvaluation(results, player_number, rewards)
 
@@ -135,4 +216,21 @@ if __name__ == "__main__":
     t.make_move(2)
     # t.make_move(6)
 
-    print(position_eval(t, player_number=1, depth=1))
\ No newline at end of file
+    print(position_eval(t, player_number=1, depth=1))
+
+    # evaluating the entire game has to give the same results with a cache that has shallower results in it
+    import random
+    cache = PositionEvalCache()
+    mismatches = 0
+    for i in range(100):
+        t = TicTacToe()
+        for j in range(random.randrange(2, 6)):
+            if t.who_won() is None:
+                t.make_move(random.choice(t.get_possible_moves()))
+        if t.who_won() is not None:
+            continue
+        player_number = random.choice([0, 1])
+        position_eval(t, player_number, random.randrange(1, 4), cache=cache)
+        if position_eval(t, player_number, -1).results != position_eval(t, player_number, -1, cache=cache).results:
+            mismatches += 1
+    print("{} full evaluations were different with the cache".format(mismatches))
\ No newline at end of file
@@ -0,0 +1,134 @@
+'''
+Proof-number search: a best-first search that tries to prove (or disprove) that a player can force a win.
+
+Each node has a proof number (how many more positions at least have to be shown to be wins to prove the goal)
+...and a disproof number (the same for disproving it). The search keeps expanding the position that would help the most,
+...so a short forced win is found quickly even when it's far too deep for position_eval to look at every move.
+'''
+from position_eval import PositionEvaluation
+
+INFINITY = float("inf")
+
+
+class ProofNode:
+    '''A position in the proof-number search tree'''
+    __slots__ = ("move", "is_or", "proof", "disproof", "children")
+
+    def __init__(self, move, game, goal_player):
+        '''
+        move: the move made to get to this position
+        is_or: whether the goal player is the one to move (so proving any child proves the position)
+        proof and disproof: the proof and disproof numbers of the position
+        children: the nodes for each move from the position (None until the position is expanded)
+        '''
+        self.move = move
+        self.is_or = game.active_player == goal_player
+        self.children = None
+        winner = game.who_won()
+        if winner is None:
+            self.proof = 1
+            self.disproof = 1
+        elif winner == goal_player:
+            self.proof = 0
+            self.disproof = INFINITY
+        else:
+            # a tie doesn't reach the goal either
+            self.proof = INFINITY
+            self.disproof = 0
+
+    def update(self):
+        '''Work out the proof and disproof numbers from the children's'''
+        children = self.children
+        if self.is_or:
+            self.proof = min([child.proof for child in children])
+            self.disproof = sum([child.disproof for child in children])
+        else:
+            self.proof = sum([child.proof for child in children])
+            self.disproof = min([child.disproof for child in children])
+
+
+def proof_number_search(game, goal_player, node_limit=100000, budget=None):
+    '''Returns True if the goal player can force a win from the game, False if they can't, and None if it's unknown
+    (because the search ran out of nodes before finding out)
+
+    node_limit: the most positions the search can create
+    budget: a Budget that each created position is spent from (see the budget module)
+    The moves are made in place (or in copies for games that can't undo), and the game is left how it started.
+    '''
+    root = ProofNode(None, game, goal_player)
+    node_amt = 1
+    while root.proof != 0 and root.disproof != 0 and node_amt < node_limit:
+        if budget is not None and budget.exhausted(0):
+            break
+
+        # go down to the most-proving position: the child that's easiest to prove at the goal player's turns
+        # ...and the child that's easiest to disprove at the opponent's turns
+        path = [root]
+        games = [game]
+        node = root
+        while node.children is not None:
+            if node.is_or:
+                node = min(node.children, key=lambda child: child.proof)
+            else:
+                node = min(node.children, key=lambda child: child.disproof)
+            games.append(games[-1].make_search_move(node.move))
+            path.append(node)
+
+        # expand it
+        leaf_game = games[-1]
+        node.children = []
+        for move in leaf_game.get_possible_moves():
+            test_game = leaf_game.make_search_move(move)
+            node.children.append(ProofNode(move, test_game, goal_player))
+            leaf_game.unmake_search_move(test_game)
+        node_amt += len(node.children)
+        if budget is not None:
+            budget.exhausted(len(node.children))
+
+        # update the numbers on the way back up and put the game back
+        for i in range(len(path) - 1, -1, -1):
+            path[i].update()
+            if i > 0:
+                games[i - 1].unmake_search_move(games[i])
+
+    if root.proof == 0:
+        return True
+    if root.disproof == 0:
+        return False
+    return None
+
+
+def proof_number_eval(game, player_number, node_limit=100000, rewards=(2, -2, 1.5, 0, 0), budget=None):
+    '''Returns a PositionEvaluation for the player, like position_eval does, but using proof-number search
+
+    It searches for a forced win for each player (with at most node_limit positions each):
+    a proven win for the player is a win and a proven win for the opponent is a loss.
+    Proving that the opponent can't force a win means the player can force a tie,
+    ...and proving that the player can't force a win means the opponent can force a tie.
+    '''
+    results = set()
+    player_wins = proof_number_search(game, player_number, node_limit, budget)
+    if player_wins:
+        results.add(0)
+    else:
+        opponent_wins = proof_number_search(game, game.get_other_player(player_number), node_limit, budget)
+        if opponent_wins:
+            results.add(1)
+        else:
+            if opponent_wins is False:
+                results.add(2)
+            if player_wins is False:
+                results.add(3)
+    return PositionEvaluation(results, player_number, rewards)
+
+
+if __name__ == "__main__":
+    import time
+    from connect_four import ConnectFour
+
+    # a position where player 0 can force a win, but it's too far away for position_eval to see 7 moves ahead
+    game = ConnectFour()
+    for move in [0, 6, 1, 6, 3, 2, 1, 5, 0, 5]:
+        game.make_move(move)
+    start_time = time.time()
+    print(proof_number_eval(game, 0), "in {:.3f} seconds".format(time.time() - start_time))
@@ -0,0 +1,86 @@
+'''
+Counters for how much work a search did, so that a slow move can be traced back to where the time went.
+
+The evaluation functions take a `stats` argument (None by default, so they don't count anything)
+...and players with collect_stats set to True put a SearchStats for each move in their last_stats attribute.
+'''
+import time
+from contextlib import nullcontext
+
+
+class SearchStats:
+    '''Counts of the work done by a search, and the seconds spent in it
+
+    nodes: positions that were looked at
+    copies: copies of games that were made
+    who_won_calls: calls to who_won
+    playouts: games that were simulated
+    playout_plies: moves made while simulating games
+    ...(these moves and their who_won calls aren't counted for games played in batches or games that can't undo)
+    cache_hits: positions that were looked up instead of searched (in transposition tables, tablebases, and so on)
+    seconds: the time spent inside `with` blocks using these stats
+
+    Work done in the different parts of a search can be counted separately in phases (see get_phase).
+    '''
+    COUNTERS = ("nodes", "copies", "who_won_calls", "playouts", "playout_plies", "cache_hits")
+
+    def __init__(self):
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+        self.seconds = 0
+        self.phases = {}
+        self.start_time = None
+
+    def get_phase(self, name):
+        '''Return the stats for the phase of the search with the given name, making them if they don't exist yet'''
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = SearchStats()
+        return phase
+
+    def __enter__(self):
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.seconds += time.perf_counter() - self.start_time
+        self.start_time = None
+
+    def add(self, other):
+        '''Add the counts and seconds of other (another SearchStats) to these stats'''
+        for name in self.COUNTERS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.seconds += other.seconds
+
+    def get_total(self, name):
+        '''Return the count with the given name, including what was counted in every phase'''
+        return getattr(self, name) + sum([phase.get_total(name) for phase in self.phases.values()])
+
+    def as_dict(self):
+        '''Return the stats as a dictionary (with the totals of the counts, and each phase's stats as a dictionary)'''
+        ans = {name: self.get_total(name) for name in self.COUNTERS}
+        ans["seconds"] = self.seconds
+        if self.phases:
+            ans["phases"] = {name: phase.as_dict() for name, phase in self.phases.items()}
+        return ans
+
+    def __str__(self):
+        counts = ", ".join(["{}: {}".format(name, self.get_total(name)) for name in self.COUNTERS])
+        ans = "<SearchStats {:.3f} seconds, {}>".format(self.seconds, counts)
+        for name, phase in self.phases.items():
+            ans += "\n  {}: {}".format(name, str(phase).replace("\n", "\n  "))
+        return ans
+
+
+def timed(stats):
+    '''Return a context manager that adds the time spent in it to stats (or does nothing if stats is None)'''
+    if stats is None:
+        return nullcontext()
+    return stats
+
+
+def get_phase(stats, name):
+    '''Return stats.get_phase(name), or None if stats is None'''
+    if stats is None:
+        return None
+    return stats.get_phase(name)
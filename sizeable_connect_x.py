@@ -1,35 +1,136 @@
 from game import Game
+from batched_playouts import get_connect_x_playout_counts
+
+# cache of the bit masks for each board size, in the form {(row amount, column amount): (full mask, ...), ...}
+_geometries = {}
+
+
+def get_geometry(row_amt, col_amt):
+    '''Return the bit masks used by a bitboard with the given number of rows and columns.
+
+    The board is stored column by column, bottom to top, with one extra empty bit on top of each column
+    ...so that shifting a piece up, right, or diagonally can never wrap around into another column.
+    The bit for a row and column is therefore at index column * (row_amt + 1) + row.
+
+    Returns a tuple in the form (full mask, bottom mask, (up shift, right shift, up-right shift, down-right shift))
+    where the full mask has a bit set for every slot on the board
+    ...and the bottom mask has a bit set for the bottom slot of each column.
+    '''
+    try:
+        return _geometries[(row_amt, col_amt)]
+    except KeyError:
+        height = row_amt + 1
+        column_mask = (1 << row_amt) - 1
+        full_mask = 0
+        bottom_mask = 0
+        for col_index in range(col_amt):
+            full_mask |= column_mask << (col_index * height)
+            bottom_mask |= 1 << (col_index * height)
+        geometry = (full_mask, bottom_mask, (1, height, height + 1, height - 1))
+        _geometries[(row_amt, col_amt)] = geometry
+        return geometry
 
 
 class SizeableConnectX(Game):
+    can_undo = True
+    # who_won checks every direction on the whole board (about 3.3µs) but the state hash takes about 0.15µs
+    # ...and position_eval and the advised players ask about the same states over and over
+    # (remembering it made a depth 6 position_eval about a third faster and the default advised player about 10% faster)
+    cached_methods = ("who_won",)
+
     def __init__(self, row_amt=6, col_amt=7, connect_amt=4, state_and_player=None):
         self.row_amt = row_amt
         self.column_amt = col_amt
         self.connect_amt = connect_amt
+        self.full_mask, self.bottom_mask, self.shifts = get_geometry(row_amt, col_amt)
         super().__init__(state_and_player)
-    
+
     def get_initial_state(self):
-        # self.column_amt slots per row, self.row_amt rows
-        # first inner list represents the bottom row from left to right
+        '''The state is a bitboard in the form [player 0's mask, player 1's mask, column heights]
+
+        Each mask is an integer with a bit set for every slot that player has moved in (see get_geometry for the layout)
+        and column heights is a list of how many pieces are in each column, from left to right.
+        '''
         # return an empty board
-        return [[-1] * self.column_amt for _ in range(self.row_amt)]
+        return [0, 0, [0] * self.column_amt]
+
+    def get_bit(self, row_index, col_index):
+        '''Return the bit for a slot on the board'''
+        return 1 << (col_index * (self.row_amt + 1) + row_index)
+
+    def get_rows(self):
+        '''Return the board as a list of rows where each row is a list of player numbers (-1 for an empty slot)
+        The first inner list represents the bottom row from left to right
+        '''
+        mask0, mask1 = self.state[0], self.state[1]
+        rows = []
+        for row_index in range(self.row_amt):
+            row = []
+            for col_index in range(self.column_amt):
+                bit = self.get_bit(row_index, col_index)
+                if mask0 & bit:
+                    row.append(0)
+                elif mask1 & bit:
+                    row.append(1)
+                else:
+                    row.append(-1)
+            rows.append(row)
+        return rows
 
     def get_state_hash(self):
-        '''Return a unique string for the state and active player'''
-        string_list = ["O", "X", " "]
-        ans = ""
-        for row in self.state:
-            for val in row:
-                ans += string_list[val]
+        '''Return a unique integer for the state'''
+        # adding the bottom mask to all the pieces carries up to one marker bit on top of each column
+        # ...so the marker bits say how full each column is and player 0's bits say who is where underneath them
+        return (self.state[0] | self.state[1]) + self.bottom_mask | self.state[0]
+
+    def get_swapped_state_hash(self):
+        '''Return the state hash the game would have after swap_players'''
+        return (self.state[0] | self.state[1]) + self.bottom_mask | self.state[1]
+
+    def get_result_cache_key(self):
+        '''Return what cached results are remembered under'''
+        # the same state hash means different boards on different board sizes
+        # ...and who won also depends on how many pieces have to be connected (but not on whose turn it is)
+        return self.get_state_hash(), self.full_mask, self.connect_amt
+
+    def mirror(self, mask):
+        '''Return a mask (or a state hash) flipped left to right'''
+        height = self.row_amt + 1
+        column_mask = (1 << height) - 1
+        last_col_index = self.column_amt - 1
+        ans = 0
+        for col_index in range(self.column_amt):
+            ans |= ((mask >> (col_index * height)) & column_mask) << ((last_col_index - col_index) * height)
         return ans
 
+    def get_canonical_hash(self):
+        '''Return a tuple in the form (canonical hash, whether or not the board was mirrored)'''
+        # a board and its mirror image are the same position
+        # the hash is built one column at a time, so mirroring the hash gives the hash of the mirrored board
+        key = self.get_hash()
+        mirrored_key = self.mirror(key)
+        if mirrored_key < key:
+            return mirrored_key, True
+        else:
+            return key, False
+
+    def move_to_canonical(self, move, symmetry):
+        if symmetry:
+            return self.column_amt - 1 - move
+        else:
+            return move
+
+    def canonical_to_move(self, move, symmetry):
+        # mirroring is its own inverse
+        return self.move_to_canonical(move, symmetry)
+
     def get_json_dict(self):
         # follows the same general idea as tic_tac_toe
         # the dictionary we will return
         ans = {}
         # iterate down from top to bottom by row
         index = 0
-        for row in reversed(self.state):
+        for row in reversed(self.get_rows()):
             for val in row:
                 # the key is the slot number, the value is the player in that slot
                 ans[str(index)] = val
@@ -44,119 +145,74 @@ class SizeableConnectX(Game):
 
     def swap_players(self):
         '''Swap the players in a game.'''
-        self.state = [[Game.get_other_player(val)
-                       if val >= 0 else -1 for val in row]
-                      for row in self.state]
+        self.state[0], self.state[1] = self.state[1], self.state[0]
 
     def get_copy(self):
         '''Return a copy of the object'''
-        return SizeableConnectX(self.row_amt, self.column_amt, self.connect_amt, ([row[:] for row in self.state], self.active_player))
+        return SizeableConnectX(self.row_amt, self.column_amt, self.connect_amt,
+                                ([self.state[0], self.state[1], self.state[2][:]], self.active_player))
 
     def get_possible_moves(self):
         '''Return a list of the possible actions that can be taken by self.active_player in the self.state state
         Behavior is undefined when the game is complete
         '''
-        # return which slots are open on the top
-        return [i for i in range(self.column_amt) if self.state[-1][i] == -1]
+        # return which columns are not full yet
+        row_amt = self.row_amt
+        return [i for i, height in enumerate(self.state[2]) if height < row_amt]
 
     def make_move(self, action):
         '''Change the state of the game and update the active player based on the action'''
         # the action specifies the column
-        # start on the bottom row to see if there's an open space, and then move up if not
-        for row in self.state:
-            if row[action] == -1:
-                row[action] = self.active_player
-                break
+        # the piece lands on top of the pieces already in that column
+        heights = self.state[2]
+        self.state[self.active_player] |= 1 << (action * (self.row_amt + 1) + heights[action])
+        heights[action] += 1
 
         self.active_player = Game.get_other_player(self.active_player)
+        self.undo_journal.append(action)
 
-    def who_won(self):
-        '''Return 0 if player 0 won, 1 if player 1 won, -1 if there was a tie, and None if the game has not finished'''
+    def unmake_move(self):
+        '''Take the top piece back out of the column of the last move'''
+        action = self.undo_journal.pop()
+        heights = self.state[2]
+        heights[action] -= 1
+        # clear the bit from both masks so this still works if the players were swapped since the move
+        bit = ~(1 << (action * (self.row_amt + 1) + heights[action]))
+        self.state[0] &= bit
+        self.state[1] &= bit
+        self.active_player = Game.get_other_player(self.active_player)
 
-        ans = -1  # default to tie
-        if -1 in self.state[-1]:
-            ans = None  # game is not complete yet
+    @classmethod
+    def get_random_playout_counts(cls, games, simulation_amount):
+        # plays all the games at once with NumPy (if the board fits)
+        return get_connect_x_playout_counts(games, simulation_amount)
 
-        # the player we're checking to see if they won
-        cur_player = None
-        # upgrade: there's duplicate code here
-        # check rows (left to right)
-        for row_index in range(self.row_amt):
-            for start_col_index in range(self.column_amt - self.connect_amt + 1):
-                # how many columns to shift over from the start_col_index
-                for col_shift in range(self.connect_amt):
-                    if col_shift == 0:
-                        cur_player = self.state[row_index][start_col_index + col_shift]
-                        if cur_player == -1:
-                            # no player has moved here yet
-                            break
-                    if self.state[row_index][start_col_index + col_shift] != cur_player:
-                        # not enough in the series
-                        break
-                    else:
-                        # found the next one in the series
-                        if col_shift == self.connect_amt - 1:
-                            # found an entire match
-                            return cur_player
-        # check columns (bottom to top)
-        for col_index in range(self.column_amt):
-            for start_row_index in range(self.row_amt - self.connect_amt + 1):
-                # how many rows to shift over from the start_row_index
-                for row_shift in range(self.connect_amt):
-                    if row_shift == 0:
-                        cur_player = self.state[start_row_index + row_shift][col_index]
-                        if cur_player == -1:
-                            # no player has moved here yet
-                            break
-                    if self.state[start_row_index + row_shift][col_index] != cur_player:
-                        # not enough in the series
-                        break
-                    else:
-                        # found the next one in the series
-                        if row_shift == self.connect_amt - 1:
-                            # found an entire match
-                            return cur_player
-
-        # check top left diagonals
-        # iterate up through the rows
-        for row_index in range(self.connect_amt - 1, self.row_amt):
-            for start_col_index in range(self.column_amt - self.connect_amt + 1):
-                # how many columns to shift over from the start_col_index
-                for shift in range(self.connect_amt):
-                    if shift == 0:
-                        cur_player = self.state[row_index - shift][start_col_index + shift]
-                        if cur_player == -1:
-                            # no player has moved here yet
-                            break
-                    if self.state[row_index - shift][start_col_index + shift] != cur_player:
-                        # not enough in the series
-                        break
-                    else:
-                        # found the next one in the series
-                        if shift == self.connect_amt - 1:
-                            # found an entire match
-                            return cur_player
-
-        # check top right diagonals
-        # iterate up through the rows
-        for row_index in range(self.row_amt - self.connect_amt + 1):
-            for start_col_index in range(self.column_amt - self.connect_amt + 1):
-                # how many columns to shift over from the start_col_index
-                for shift in range(self.connect_amt):
-                    if shift == 0:
-                        cur_player = self.state[row_index + shift][start_col_index + shift]
-                        if cur_player == -1:
-                            # no player has moved here yet
-                            break
-                    if self.state[row_index + shift][start_col_index + shift] != cur_player:
-                        # not enough in the series
-                        break
-                    else:
-                        # found the next one in the series
-                        if shift == self.connect_amt - 1:
-                            # found an entire match
-                            return cur_player
-        return ans
+    def has_connection(self, mask):
+        '''Return whether or not the mask has self.connect_amt bits in a row in any direction'''
+        connect_amt = self.connect_amt
+        for shift in self.shifts:
+            # each bit left in line marks the start of a run of connected bits in this direction
+            line = mask
+            for distance in range(1, connect_amt):
+                line &= mask >> (shift * distance)
+                if not line:
+                    break
+            if line:
+                return True
+        return False
+
+    def who_won(self):
+        '''Return 0 if player 0 won, 1 if player 1 won, -1 if there was a tie, and None if the game has not finished'''
+        mask0, mask1 = self.state[0], self.state[1]
+        if self.has_connection(mask0):
+            return 0
+        if self.has_connection(mask1):
+            return 1
+        if mask0 | mask1 == self.full_mask:
+            # the board is full
+            return -1
+        # game is not complete yet
+        return None
 
     def __str__(self):
         '''Return a human-understandable string representing the game'''
@@ -165,4 +221,4 @@ class SizeableConnectX(Game):
         # replacing -1s with dashes
         return "Player {}'s turn:\n{}".format(self.active_player,
                                               "\n".join([str(row).replace("-1", "-")
-                                                         for row in reversed(self.state)]))
+                                                         for row in reversed(self.get_rows())]))
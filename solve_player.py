@@ -1,32 +1,66 @@
 from players import Player
-from minimax import complete_minimax
-from evaluation import get_winner_reward
+from negamax import NegamaxSearcher
+from evaluation import Evaluation, WinnerRewardEvaluator
+from tablebase import Tablebase, write_tablebase
+from search_stats import timed
 
 class SolvePlayer(Player):
     def __init__(self):
         '''Initialize a SolvePlayer
 
-        self.memory is a dictionary in the form {game hash: (best move, expected value), ...}
+        self.memory is a dictionary in the form {canonical game hash: (best canonical move, expected value), ...}
+        where each expected value is for the player making the move in that position
+        (see Game.get_canonical_hash); symmetric positions share one entry
         The player will use self.memory to look up the best moves to make.
         self.my_eval is a customized simple evaluation function to tell if a game is a win, loss, or tie
+        self.searcher solves the positions; it keeps its transposition table between moves so later solves are quick
+        self.tablebase is a Tablebase of positions solved ahead of time (see load_tablebase), which is checked first
         '''
         self.memory = {}
-        self.my_eval = lambda game, player_number: get_winner_reward(game, player_number, [1, -1, 0])
+        self.my_eval = WinnerRewardEvaluator((1, -1, 0)).evaluate
+        self.searcher = NegamaxSearcher(self.my_eval)
+        self.tablebase = None
 
     def make_move(self, game):
         '''Makes a logically best move possible in a game.
 
         Solves unseen positions and then looks up solutions from its memory.
+        With collect_stats, finding the position in the tablebase or memory counts as a cache hit.
         '''
-        try:
-            # check to see if we've already solved this position
-            game.make_move(self.memory[game.get_hash()][0])
-        except KeyError:
-            # we hadn't already solved it
-            # solve it and remember the solution in memory
-            self.memory.update(complete_minimax(game, -1, self.my_eval))
-            # try again
-            self.make_move(game)
+        stats = self.get_new_stats()
+        with timed(stats):
+            game_hash, symmetry = game.get_canonical_hash()
+            # check to see if we've already solved this position (or a symmetric version of it)
+            solution = None
+            if self.tablebase is not None:
+                solution = self.tablebase.get(game_hash)
+            if solution is None:
+                solution = self.memory.get(game_hash)
+            if solution is None:
+                # we hadn't already solved it
+                # solve it and remember the solution in memory
+                self.searcher.stats = stats
+                solutions = self.searcher.search(game)
+                self.searcher.stats = None
+                # the search's values are for whoever was moving at the start of this search
+                # ...so take them from the searcher's table instead, where they're for the player moving in each position
+                # (otherwise positions solved from different sides' turns would be stored differently)
+                for solution_hash, (move, _) in solutions.items():
+                    self.memory[solution_hash] = (move, Evaluation(self.searcher.table[solution_hash][2]))
+                solution = self.memory[game_hash]
+            elif stats is not None:
+                stats.cache_hits += 1
+            game.make_move(game.canonical_to_move(solution[0], symmetry))
+
+    def load_tablebase(self, path, game_name=None):
+        '''Look up moves in the tablebase file at path (see the tablebase module) before solving anything
+        If game_name is given, the tablebase has to have been exported for a game with that name.
+        '''
+        self.tablebase = Tablebase(path, game_name)
+
+    def export_tablebase(self, path, game_name):
+        '''Write everything in self.memory to a tablebase file at path that load_tablebase can load later'''
+        write_tablebase(path, self.memory, game_name)
 
     def __str__(self):
         return "<SolvePlayer object>"
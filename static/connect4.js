@@ -158,12 +158,35 @@ function human_move(move_num) {
   });
 }
 
+// the bot always takes at least this long (in milliseconds) to show its move, since it looks weird when it responds instantly
+var MIN_BOT_MOVE_TIME = 1000;
+// how long to wait (in milliseconds) before asking again when the server is still working on the bot's move
+var BOT_MOVE_RETRY_TIME = 500;
+
 // Passes data back to front end after bot makes a move
 function bot_move() {
   $("#waiting").show();
+  var start_time = Date.now();
   $.post("/bot_move", {}, function(data) {
-    render_board(data);
+    // only wait for however much of the minimum time the bot didn't already take
+    setTimeout(function() {
+      render_board(data);
+      $("#waiting").hide();
+    }, Math.max(0, MIN_BOT_MOVE_TIME - (Date.now() - start_time)));
+  }).fail(function(xhr) {
+    // the bot is still thinking, so ask again (the server keeps working on the same move)
+    if (xhr.status == 503) {
+      setTimeout(bot_move, BOT_MOVE_RETRY_TIME);
+      return;
+    }
     $("#waiting").hide();
+    // the server forgot the game, or the bot (or the connection) failed, so let the player decide what to do
+    if (xhr.status == 400) {
+      alert("This game has expired. Reload the page to start a new one.");
+    }
+    else if (confirm("The bot couldn't make its move. Try again?")) {
+      bot_move();
+    }
   });
 }
 
@@ -0,0 +1,156 @@
+'''
+Tablebases are files of solved positions that can be looked up without loading the whole file into memory.
+
+A tablebase file is a header followed by one fixed-size record for each position, sorted by key:
+    header: magic bytes, format version, key size, length of the game name, record count, game name (utf-8)
+    record: canonical game hash (big-endian, key size bytes), best canonical move (int16),
+        result for the player making the move (int8)
+Because the keys are big-endian and sorted, a position is found with a binary search right on the file.
+The file is memory-mapped, so processes that open the same file share one copy of it in the page cache.
+
+Only games whose moves are small integers (like tic-tac-toe and connect x) and whose results are small integers
+(like the wins, losses, and ties SolvePlayer finds) can be stored.
+'''
+import mmap
+import os
+import struct
+import tempfile
+
+from evaluation import Evaluation
+from negamax import NegamaxSearcher
+
+MAGIC = b"BTYT"
+VERSION = 1
+# magic, version, key size, game name length, record count
+HEADER = struct.Struct(">4sBBHI")
+# move and result
+RECORD_TAIL = struct.Struct(">hb")
+
+
+def write_tablebase(path, memory, game_name):
+    '''Write a dictionary in the form {canonical game hash: (best canonical move, Evaluation), ...} to a tablebase file
+    (like the memory of a SolvePlayer or what solve_positions returns)
+    The Evaluations have to be for the player making the move in each position, since that's what the file says they are.
+    Positions with no best move (finished games) are left out.
+    game_name is stored in the file so that tablebases for different games can't be mixed up
+    '''
+    entries = sorted((key, move, evaluation.value) for key, (move, evaluation) in memory.items() if move is not None)
+    max_key = entries[-1][0] if entries else 0
+    key_size = max(1, (max_key.bit_length() + 7) // 8)
+    name = game_name.encode("utf-8")
+
+    # write to a temporary file and then move it into place so that nobody ever opens half of a tablebase
+    # (each writer gets its own temporary file, so processes building the same tablebase at once can't mix theirs up)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, key_size, len(name), len(entries)))
+            f.write(name)
+            for key, move, value in entries:
+                if value != int(value):
+                    raise ValueError("Tablebases can only store whole number results, not {}".format(value))
+                f.write(key.to_bytes(key_size, "big"))
+                f.write(RECORD_TAIL.pack(move, int(value)))
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+class Tablebase:
+    '''A read-only tablebase file that can be used like the memory of a SolvePlayer'''
+
+    def __init__(self, path, game_name=None):
+        '''game_name: the name of the game the tablebase has to be for (None to load a tablebase for any game)'''
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.key_size, name_length, self.count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("{} is not a tablebase file".format(path))
+        self.game_name = self.data[HEADER.size:HEADER.size + name_length].decode("utf-8")
+        if game_name is not None and self.game_name != game_name:
+            self.data.close()
+            raise ValueError("{} is a tablebase for {}, not {}".format(path, self.game_name, game_name))
+        self.start = HEADER.size + name_length
+        self.record_size = self.key_size + RECORD_TAIL.size
+
+    def find(self, key):
+        '''Return the offset of the record for the key, or None if the key isn't in the tablebase'''
+        key_size = self.key_size
+        if key >= 1 << (key_size * 8):
+            return None
+        key_bytes = key.to_bytes(key_size, "big")
+        data, start, record_size = self.data, self.start, self.record_size
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            offset = start + middle * record_size
+            record_key = data[offset:offset + key_size]
+            if record_key < key_bytes:
+                low = middle + 1
+            elif record_key > key_bytes:
+                high = middle
+            else:
+                return offset
+        return None
+
+    def get(self, key, default=None):
+        '''Return the (best canonical move, Evaluation) for the key, or default if the key isn't in the tablebase'''
+        offset = self.find(key)
+        if offset is None:
+            return default
+        move, value = RECORD_TAIL.unpack_from(self.data, offset + self.key_size)
+        return move, Evaluation(value)
+
+    def __getitem__(self, key):
+        ans = self.get(key)
+        if ans is None:
+            raise KeyError(key)
+        return ans
+
+    def __contains__(self, key):
+        return self.find(key) is not None
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        self.data.close()
+
+
+def solve_positions(game, eval_func):
+    '''Returns a dictionary in the form {canonical game hash: (best canonical move, Evaluation), ...}
+    for every position that can be reached from the game where a move can be made
+    Values are for the player making the move in each position.
+    '''
+    searcher = NegamaxSearcher(eval_func)
+    ans = {}
+
+    def solve(game):
+        game_hash = game.get_canonical_hash()[0]
+        if game_hash in ans or game.who_won() is not None:
+            return
+        # the search only finds exact values for some positions, but it always finds this one
+        ans[game_hash] = searcher.search(game)[game_hash]
+        for move in game.get_possible_moves():
+            test_game = game.make_search_move(move)
+            solve(test_game)
+            game.unmake_search_move(test_game)
+
+    solve(game)
+    return ans
+
+
+if __name__ == "__main__":
+    '''Builds tablebases offline'''
+    import time
+    from evaluation import WinnerRewardEvaluator
+    from tic_tac_toe import TicTacToe
+    from sizeable_connect_x import SizeableConnectX
+
+    my_eval = WinnerRewardEvaluator((1, -1, 0)).evaluate
+    for game, game_name, path in [(TicTacToe(), "tic-tac-toe", "tic_tac_toe.tb"),
+                                  (SizeableConnectX(4, 4, 4), "connect 4 on a 4 x 4 board", "connect_4_4x4.tb")]:
+        start_time = time.time()
+        write_tablebase(path, solve_positions(game, my_eval), game_name)
+        print("Wrote {} positions to {} in {:.2f} seconds".format(len(Tablebase(path)), path, time.time() - start_time))
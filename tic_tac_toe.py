@@ -4,6 +4,15 @@ Class for the game Tic-tac-toe
 '''
 
 from game import Game
+from mnk_tables import get_tables, get_board_index, get_symmetries, get_inverse, get_symmetric_index
+
+# lookup tables indexed by the base 3 index of the board (see mnk_tables.py)
+POWERS, WINNERS, EMPTY_CELLS, SWAPPED_INDEXES = get_tables(3, 3, 3)
+# the 8 rotations and reflections of the board, and the symmetries that undo them
+SYMMETRIES = get_symmetries(3, 3)
+INVERSE_SYMMETRIES = [get_inverse(symmetry) for symmetry in SYMMETRIES]
+# cache of canonical hashes in the form {board index: (canonical board index, index of the symmetry), ...}
+_canonical_hashes = {}
 
 
 class TicTacToe(Game):
@@ -11,6 +20,12 @@ class TicTacToe(Game):
 
     See the Game class documentation for explanations of each method.
     '''
+    can_undo = True
+
+    def __init__(self, state_and_player=None):
+        super().__init__(state_and_player)
+        # the base 3 index of the board, kept up to date by make_move and used to look up the game in the tables
+        self.board_index = get_board_index(self.state)
 
     def get_initial_state(self):
         '''The state of the game is a list of nine numbers.
@@ -35,16 +50,29 @@ class TicTacToe(Game):
         return [-1] * 9
 
     def get_state_hash(self):
-        '''Return a human-readable hash.
-
-        This hash is also used by the __str__ method below, so edit with caution.
-        '''
-        # technically, this doesn't have to be human-readable, but it was useful for debugging
-        string_list = ["O", "X", " "]
-        ans = ""
-        for val in self.state:
-            ans += string_list[val]
-        return ans
+        '''Return the base 3 index of the board, which is unique for each board'''
+        return self.board_index
+
+    def get_swapped_state_hash(self):
+        # look up the swapped board instead of making a swapped copy
+        return SWAPPED_INDEXES[self.board_index]
+
+    def get_canonical_hash(self):
+        # the canonical board is whichever rotation or reflection has the smallest index
+        index = self.get_hash()
+        try:
+            return _canonical_hashes[index]
+        except KeyError:
+            ans = min([(get_symmetric_index(index, symmetry, POWERS), symmetry_index)
+                       for symmetry_index, symmetry in enumerate(SYMMETRIES)])
+            _canonical_hashes[index] = ans
+            return ans
+
+    def move_to_canonical(self, move, symmetry):
+        return INVERSE_SYMMETRIES[symmetry][move]
+
+    def canonical_to_move(self, move, symmetry):
+        return SYMMETRIES[symmetry][move]
 
     def get_json_dict(self):
         # the dictionary we will return
@@ -68,97 +96,38 @@ class TicTacToe(Game):
 
     def swap_players(self):
         self.state = [Game.get_other_player(val) if val >= 0 else -1 for val in self.state]
+        self.board_index = SWAPPED_INDEXES[self.board_index]
 
     def get_copy(self):
         return TicTacToe((self.state[:], self.active_player))
 
     def get_possible_moves(self):
-        return [i for i in range(len(self.state)) if self.state[i] == -1]
+        # the table's tuples are shared by every game, so callers get their own list (which they can shuffle or change)
+        return list(EMPTY_CELLS[self.board_index])
+
+    def get_continue_moves(self):
+        if WINNERS[self.board_index] is None:
+            return list(EMPTY_CELLS[self.board_index])
+        else:
+            return []
 
     def make_move(self, action):
         self.state[action] = self.active_player
+        self.board_index += (self.active_player + 1) * POWERS[action]
         self.active_player = Game.get_other_player(self.active_player)
+        self.undo_journal.append(action)
 
-    def who_won(self):
-        if -1 in self.state:
-            # game is not done, default to unfinished
-            ans = None
-        else:
-            # game is done, default to tie
-            ans = -1
+    def unmake_move(self):
+        action = self.undo_journal.pop()
+        self.board_index -= (self.state[action] + 1) * POWERS[action]
+        self.state[action] = -1
+        self.active_player = Game.get_other_player(self.active_player)
 
-        # the current player number we're checking to see if they won
-        player = None
-        '''
-        When checking is 0 we check rows
-        When checking is 1 we check columns
-        When checking is 2 we check top left diagonal
-        When checking is 3 we check top right diagonal
-        '''
-        # upgrade: less duplicate code
-        for checking in range(4):
-            # the number of the symbol in the series we're looking for
-            for i in range(3):
-                if checking < 2:
-                    # checking rows and columns
-                    for j in range(3):
-                        if checking == 0:
-                            # checking rows
-                            # iterate through the row
-                            val = self.state[i * 3 + j]
-                        else:
-                            # checking == 1
-                            # checking columns
-                            # iterate through the column
-                            val = self.state[i + j * 3]
-
-                        if val == -1:
-                            # person doesn't have the entire row or column
-                            break
-                        else:
-                            # if it just started checking this line
-                            if j == 0:
-                                # whoever has the first space must have the other two to win
-                                player = val
-                            # if the player doesn't have a win
-                            elif not val == player:
-                                break
-                            # if the player does have a win
-                            elif j == 2:
-                                return player
-                else:
-                    # checking diagonals
-                    if checking == 2:
-                        # want it to check slots 0, 4, 8
-                        val = self.state[i * 4]
-                    else:
-                        # checking == 3
-                        # want it to check slots 2, 4, 6
-                        val = self.state[(i + 1) * 2]
-
-                    if val == -1:
-                        # person doesn't have the row or column
-                        break
-                    else:
-                        # if we just started checking this diagonal
-                        if i == 0:
-                            # whoever has the first space must have the other two to win
-                            player = val
-                        elif not val == player:
-                            # if the player doesn't have a win
-                            break
-                        elif i == 2:
-                            # if the player does have a win
-                            return player
-        return ans
+    def who_won(self):
+        return WINNERS[self.board_index]
 
     def __str__(self):
-        if self.active_player == 0:
-            this = self
-        else:
-            this = self.get_swapped_copy()
-
-        # replace the spaces in the hash with dashes to make it move human-readable
-        ans = this.get_hash().replace(" ", "-")
+        # O is player 0, X is player 1, and dashes are empty slots
+        ans = "".join([["O", "X", "-"][val] for val in self.state])
         # format in the rows
         return "{}'s turn:\n{}\n{}\n{}".format(["O", "X"][self.active_player], ans[0:3], ans[3:6], ans[6:9])